@@ -1,18 +1,32 @@
 # auto_scheduler.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 import mysql.connector
+import json
+import logging
 import random
-from collections import deque
+import threading
 from datetime import datetime, timedelta
 from .conflicts import detect_and_save_conflicts  # ensure this exists
 
 # --- New imports for performance improvements
-from functools import lru_cache
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 import time
 import itertools
-import numpy as np
-from typing import List, Dict, Set, Tuple, Any
+
+# The solver itself lives in scheduler_core, which has no Flask or MySQL dependency
+from scheduler_core.cache import SolutionCache, generation_fingerprint
+from scheduler_core.constraints import (
+    ScheduleIndex, DomainTable, Session, conflicts_with_approved_schedule, intervals_overlap, parse_time_str
+)
+from scheduler_core.context import SolverContext
+from scheduler_core.domains import DomainBuilder, SlotCatalogue, build_time_slots, placement_rules, prefilter_domains
+from scheduler_core.scoring import SoftScorer, optimize_schedule
+from scheduler_core.search import (
+    HEURISTICS, VALUE_ORDERS, SearchInterrupted, SolveOutcome, ac3, explain_unscheduled, extend_partial, min_conflicts,
+    solve_components
+)
+
+logger = logging.getLogger(__name__)
 
 auto_scheduler_bp = Blueprint('auto_scheduler', __name__, url_prefix='/admin/auto_scheduler')
 
@@ -48,72 +62,6 @@ def inject_instructor_name():
     )
 
 
-# ---------- Patterns ----------
-PATTERNS = {
-    'MWF': ['Monday', 'Wednesday', 'Friday'],
-    'TTh': ['Tuesday', 'Thursday'],
-    'OneDay': ['Monday']
-}
-
-def sessions_for_subject(subj):
-    try:
-        units = int(subj.get('units', 3))
-    except Exception:
-        units = 3
-        
-    course_type = (subj.get('course_type') or 'major').lower()
-    
-    # MAJOR SUBJECTS: 5 hours per week (3 units = 3 hours lecture + 2 hours lab)
-    if course_type == 'major' and units == 3:
-        return ('MWF_TTh', 5)  # Special pattern for major subjects
-    
-    # Non-major subjects follow normal patterns
-    if units >= 3:
-        return ('MWF', 3)
-    elif units == 2:
-        return ('TTh', 2)
-    else:
-        return ('OneDay', 1)
-
-
-# ---------- Time helpers ----------
-# Pre-compute time conversions for faster processing
-_time_cache = {}
-def parse_time_str(t):
-    if not t:
-        return None
-    if t in _time_cache:
-        return _time_cache[t]
-    
-    if isinstance(t, str):
-        for fmt in ("%H:%M:%S", "%H:%M"):
-            try:
-                dt = datetime.strptime(t, fmt)
-                result = dt.strftime("%H:%M")
-                _time_cache[t] = result
-                return result
-            except Exception:
-                continue
-    return None
-
-# Pre-computed time interval checks
-@lru_cache(maxsize=10000)
-def _intervals_overlap_cached(s1: str, e1: str, s2: str, e2: str) -> bool:
-    """Cached version of interval overlap check - 100x faster than datetime parsing"""
-    # Convert "HH:MM" to minutes since midnight for fast comparison
-    def time_to_minutes(t: str) -> int:
-        h, m = map(int, t.split(':'))
-        return h * 60 + m
-    
-    start1, end1 = time_to_minutes(s1), time_to_minutes(e1)
-    start2, end2 = time_to_minutes(s2), time_to_minutes(e2)
-    
-    return not (end1 <= start2 or end2 <= start1)
-
-def intervals_overlap(s1, e1, s2, e2):
-    return _intervals_overlap_cached(s1, e1, s2, e2)
-
-
 # ---------- Approved Schedule Conflict Check ----------
 def get_approved_schedules(semester, school_year):
     """Get all approved schedules from database to avoid conflicts"""
@@ -142,361 +90,148 @@ def get_approved_schedules(semester, school_year):
         schedule['start_time'] = parse_time_str(str(schedule['start_time']))
         schedule['end_time'] = parse_time_str(str(schedule['end_time']))
     
-    return approved_schedules
-
-def conflicts_with_approved_schedule(candidate_session, approved_schedules):
-    """Check if candidate session conflicts with any approved schedule"""
-    candidate_instructor = candidate_session.get('instructor_id')
-    candidate_room = candidate_session.get('room_id')
-    candidate_day = candidate_session.get('day_of_week')
-    candidate_start = candidate_session.get('start_time')
-    candidate_end = candidate_session.get('end_time')
-    
-    for approved in approved_schedules:
-        # Same instructor conflict
-        if (approved['instructor_id'] == candidate_instructor and 
-            approved['day_of_week'] == candidate_day and
-            intervals_overlap(approved['start_time'], approved['end_time'], candidate_start, candidate_end)):
-            return True
-            
-        # Same room conflict  
-        if (approved['room_id'] == candidate_room and
-            approved['day_of_week'] == candidate_day and
-            intervals_overlap(approved['start_time'], approved['end_time'], candidate_start, candidate_end)):
-            return True
-    
-    return False
+    return ScheduleIndex(approved_schedules)
 
 
-# ---------- Conflict check ----------
-# Optimized group compatibility with vectorized operations
-class GroupKey:
-    """Immutable key for group compatibility checking - 10x faster than tuple creation"""
-    __slots__ = ('sessions_data', 'hash_val')
-    
-    def __init__(self, group):
-        # Pre-compute and store essential data
-        self.sessions_data = tuple(
-            (
-                int(session.get('subject_id') or 0),
-                int(session.get('instructor_id') or 0),
-                int(session.get('room_id') or 0),
-                session.get('day_of_week', ''),
-                session.get('start_time', ''),
-                session.get('end_time', '')
-            )
-            for session in group
-        )
-        self.hash_val = hash(self.sessions_data)
-    
-    def __hash__(self):
-        return self.hash_val
-    
-    def __eq__(self, other):
-        return self.sessions_data == other.sessions_data
-
-# Global cache for compatibility results
-_compatibility_cache = {}
-
-def groups_compatible(group_a, group_b):
-    """Optimized compatibility check - 50x faster with caching"""
-    if not group_a or not group_b:
-        return True
-    
-    # Create cache keys
-    key_a = GroupKey(group_a)
-    key_b = GroupKey(group_b)
-    
-    # Check cache first
-    cache_key = (key_a.hash_val, key_b.hash_val)
-    if cache_key in _compatibility_cache:
-        return _compatibility_cache[cache_key]
-    
-    # Optimized compatibility check
-    result = _groups_compatible_fast(key_a.sessions_data, key_b.sessions_data)
-    _compatibility_cache[cache_key] = result
-    return result
-
-def _groups_compatible_fast(sessions_a, sessions_b):
-    """Vectorized compatibility check without Python loops where possible"""
-    for a in sessions_a:
-        subj_id_a, instr_id_a, room_id_a, day_a, start_a, end_a = a
-        for b in sessions_b:
-            subj_id_b, instr_id_b, room_id_b, day_b, start_b, end_b = b
-            
-            # Same subject conflict
-            if subj_id_a == subj_id_b and subj_id_a != 0:
-                if instr_id_a != instr_id_b or room_id_a != room_id_b:
-                    return False
-                if day_a == day_b:
-                    return False
-            
-            # Time overlap conflict
-            if day_a == day_b and day_a and day_b:
-                if _intervals_overlap_cached(start_a, end_a, start_b, end_b):
-                    if instr_id_a == instr_id_b and instr_id_a != 0:
-                        return False
-                    if room_id_a == room_id_b and room_id_a != 0:
-                        return False
-    
-    return True
-
+# ---------- Conflicts ----------
+def get_conflicting_schedule_ids():
+    detect_and_save_conflicts()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT schedule1_id, schedule2_id FROM conflicts")
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    ids = set()
+    for r in rows:
+        if r[0] is not None:
+            ids.add(r[0])
+        if r[1] is not None:
+            ids.add(r[1])
+    return list(ids)
 
-# ---------- CSP helpers ----------
-def ac3(domains, trim_large_domains=True):
-    """Optimized AC-3 with early termination and better queue management"""
-    keys = list(domains.keys())
-    if not keys:
-        return True
-    
-    # Use set for faster lookups and list for ordered processing
-    queue = deque()
-    
-    # Initialize queue with constraints between variables with smaller domains first
-    for i, xi in enumerate(keys):
-        for xj in keys[i+1:]:
-            if not trim_large_domains or (len(domains[xi]) < 40 and len(domains[xj]) < 40):
-                queue.append((xi, xj))
-                queue.append((xj, xi))
-    
-    # Early termination counter
-    revisions = 0
-    max_revisions = len(keys) * 100  # Prevent infinite loops
-    
-    while queue and revisions < max_revisions:
-        xi, xj = queue.popleft()
-        if revise_fast(domains, xi, xj):
-            revisions += 1
-            if not domains[xi]:
-                return False
-            for xk in domains:
-                if xk != xi and xk != xj:
-                    queue.append((xk, xi))
-    return True
-
-def revise_fast(domains, xi, xj):
-    """Optimized revision with pre-filtering"""
-    domain_xi = domains[xi]
-    domain_xj = domains[xj]
-    
-    if not domain_xi or not domain_xj:
-        return False
-    
-    # Pre-compute compatibility for faster checking
-    to_remove = []
-    
-    # Use list comprehension for faster filtering
-    xj_compatible_set = set()
-    for val_y in domain_xj:
-        xj_compatible_set.add(GroupKey(val_y).hash_val)
-    
-    for val_x in domain_xi:
-        key_x = GroupKey(val_x)
-        found_compatible = False
-        
-        for val_y in domain_xj:
-            if (key_x.hash_val, GroupKey(val_y).hash_val) in _compatibility_cache:
-                if _compatibility_cache[(key_x.hash_val, GroupKey(val_y).hash_val)]:
-                    found_compatible = True
-                    break
-            elif groups_compatible(val_x, val_y):
-                found_compatible = True
-                break
-        
-        if not found_compatible:
-            to_remove.append(val_x)
-    
-    if to_remove:
-        domains[xi] = [val for val in domain_xi if val not in to_remove]
-        return True
-    
-    return False
 
-def forward_check(assignment, domains, var, value):
-    """Optimized forward checking with bulk operations"""
-    backup = {}
-    value_key = GroupKey(value)
-    
-    for other_var in domains:
-        if other_var in assignment or other_var == var:
-            continue
-        
-        # Bulk compatibility check
-        filtered = []
-        for g in domains[other_var]:
-            cache_key = (value_key.hash_val, GroupKey(g).hash_val)
-            if cache_key in _compatibility_cache:
-                if _compatibility_cache[cache_key]:
-                    filtered.append(g)
-            elif groups_compatible(value, g):
-                filtered.append(g)
-        
-        if not filtered:
-            # Restore backups if failure
-            for dv, vals in backup.items():
-                domains[dv] = vals
-            return False
-        
-        if len(filtered) < len(domains[other_var]):
-            backup[other_var] = domains[other_var]
-            domains[other_var] = filtered
-    
-    return backup
+# ---------- Incremental rescheduling ----------
+INCREMENTAL_MAX_EXPANSIONS = 2
 
+def get_draft_schedules(semester, school_year):
+    """Unapproved draft sessions of a term, grouped by subject ID"""
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    cur.execute("""
+        SELECT subject_id, instructor_id, room_id, day_of_week, start_time, end_time
+        FROM schedules
+        WHERE semester = %s AND school_year = %s
+          AND (approved IS NULL OR approved = 0)
+    """, (semester, school_year))
+    rows = cur.fetchall()
+    conn.close()
 
-# ---------- Consistency check ----------
-def is_consistent_assignment(assignment, candidate_group):
-    """Optimized consistency check with early termination"""
-    candidate_key = GroupKey(candidate_group)
-    
-    for other_group in assignment.values():
-        if not groups_compatible(candidate_group, other_group):
-            return False
-
-    # --- Additional rule for part-time instructors (spread loads across days)
-    instr = candidate_group[0]['instructor_id']
-    if instructor_status.get(instr, '') == 'part time':
-        assigned_days = set()
-        for grp in assignment.values():
-            if grp[0]['instructor_id'] == instr:
-                assigned_days.update(s['day_of_week'] for s in grp)
-        new_days = {s['day_of_week'] for s in candidate_group}
-        all_days = assigned_days.union(new_days)
-        if len(all_days) == 1:  # all classes in one day
-            return False
-    return True
-
-
-def select_unassigned_variable(domains, assignment):
-    """Optimized variable selection with numpy for large sets"""
-    unassigned = [v for v in domains if v not in assignment]
-    if not unassigned:
-        return None
-    
-    # Use numpy for faster min calculation on large sets
-    if len(unassigned) > 1000:
-        domain_sizes = np.array([len(domains[v]) for v in unassigned])
-        min_index = np.argmin(domain_sizes)
-        return unassigned[min_index]
-    else:
-        return min(unassigned, key=lambda v: len(domains[v]))
+    drafts = {}
+    for row in rows:
+        row['start_time'] = parse_time_str(str(row['start_time']))
+        row['end_time'] = parse_time_str(str(row['end_time']))
+        drafts.setdefault(row['subject_id'], []).append(row)
+    return drafts
 
 
-def count_group_sessions(group):
-    """Inline this function for speed"""
-    return len(group)
+def _clashing_drafts(drafts):
+    """Subjects whose drafts overlap another subject's draft on an instructor or room"""
+    buckets = {}
+    for sid, sessions in drafts.items():
+        for s in sessions:
+            for resource in (('instructor', s['instructor_id']), ('room', s['room_id'])):
+                buckets.setdefault((resource, s['day_of_week']), []).append((sid, s))
 
+    clashing = set()
+    for entries in buckets.values():
+        for (sid_a, a), (sid_b, b) in itertools.combinations(entries, 2):
+            if sid_a != sid_b and intervals_overlap(a['start_time'], a['end_time'], b['start_time'], b['end_time']):
+                clashing.update((sid_a, sid_b))
+    return clashing
 
-# Optimized backtracking with memoization
-_backtrack_cache = {}
 
-def backtrack(assignment, domains, instructor_load, max_loads):
-    """Optimized backtracking with state caching"""
-    if len(assignment) == len(domains):
-        return assignment
+def _drafts_fit_rules(subj, sessions, room_types, present_types, time_slots, statuses):
+    """Whether a subject's drafts still have the shape DomainBuilder would give it
 
-    # Create state signature for caching
-    state_sig = (
-        frozenset(assignment.keys()),
-        frozenset((k, len(v)) for k, v in domains.items() if k not in assignment),
-        frozenset(instructor_load.items())
-    )
-    
-    if state_sig in _backtrack_cache:
-        return _backtrack_cache[state_sig]
+    One session per pattern day, each on one of the run's time slots of the
+    half's length, in a room of the half's type, and away from lunch within 8-5
+    for permanent instructors.
+    """
+    permanent = statuses.get(subj['instructor_id'], '') == 'permanent'
+    by_day = {s['day_of_week']: s for s in sessions}
+    expected = 0
+    for types, days, min_duration, max_duration in placement_rules(subj):
+        room_type = next((t for t in types if t in present_types), None)
+        for day in days:
+            s = by_day.get(day)
+            if (s is None or room_types.get(s['room_id']) != room_type
+                    or (s['start_time'], s['end_time']) not in time_slots
+                    or not SlotCatalogue.slot_allowed(s['start_time'], s['end_time'],
+                                                      min_duration, max_duration, permanent)):
+                return False
+        expected += len(days)
+    return len(sessions) == expected == len(by_day)
 
-    var = select_unassigned_variable(domains, assignment)
-    if var is None:
-        return None
 
-    domain_vals = domains[var]
-    # Sort by group size and use numpy for large domains
-    if len(domain_vals) > 100:
-        domain_vals = sorted(domain_vals, key=len)
-    else:
-        domain_vals.sort(key=len)
+def touched_subjects(subjects, drafts, rooms, room_programs_map, approved_schedules, statuses, time_slots,
+                     requested=()):
+    """Subjects whose drafts have to be solved again
 
-    for group in domain_vals:
-        if not group:
-            continue
-            
-        instr = group[0].get('instructor_id')
-        if instr is None:
+    A subject is touched when it was requested, has no draft, or its draft names
+    another instructor, a removed room, a room closed to its program, or clashes
+    with an approved schedule or another draft. It is also touched when its draft
+    no longer has the days, lengths, room type or hours the domain builder would
+    give it now, e.g. after its units, the room's type, the instructor's status
+    or the time window changed. Part-time instructors are solved as a whole so
+    the one-day rule still sees all of their subjects.
+    """
+    room_types = {r['room_id']: r['room_type'] for r in rooms}
+    present_types = set(room_types.values())
+    time_slots = set(time_slots)
+    requested = set(requested)
+    touched = set()
+    for subj in subjects:
+        sid = subj['subject_id']
+        sessions = drafts.get(sid)
+        if (sid in requested or not sessions
+                or not _drafts_fit_rules(subj, sessions, room_types, present_types, time_slots, statuses)):
+            touched.add(sid)
             continue
+        program = (subj.get('course') or '').strip().upper()
+        for s in sessions:
+            allowed_programs = room_programs_map.get(s['room_id'], [])
+            if (s['instructor_id'] != subj['instructor_id']
+                    or s['room_id'] not in room_types
+                    or (allowed_programs and program not in allowed_programs)
+                    or conflicts_with_approved_schedule(s, approved_schedules)):
+                touched.add(sid)
+                break
 
-        sessions_needed = len(group)
-        current_load = instructor_load.get(instr, 0)
-        
-        # Early load check
-        if current_load + sessions_needed > max_loads.get(instr, 0):
-            continue
+    subject_ids = {subj['subject_id'] for subj in subjects}
+    touched |= _clashing_drafts(drafts) & subject_ids
 
-        # Early consistency check
-        if not is_consistent_assignment(assignment, group):
-            continue
+    part_time = {subj['instructor_id'] for subj in subjects
+                 if subj['subject_id'] in touched and statuses.get(subj['instructor_id'], '') == 'part time'}
+    touched.update(subj['subject_id'] for subj in subjects if subj['instructor_id'] in part_time)
+    return touched
 
-        assignment[var] = group
-        instructor_load[instr] = current_load + sessions_needed
-
-        backup = forward_check(assignment, domains, var, group)
-        if backup is not False:
-            result = backtrack(assignment, domains, instructor_load, max_loads)
-            if result:
-                _backtrack_cache[state_sig] = result
-                return result
-
-        # rollback
-        del assignment[var]
-        instructor_load[instr] = current_load
-        if backup:
-            for dv, vals in backup.items():
-                domains[dv] = vals
-    
-    _backtrack_cache[state_sig] = None
-    return None
 
+def conflict_neighbours(subject_ids, drafts, subjects_by_id):
+    """Subjects sharing an instructor or a drafted room with ``subject_ids``"""
+    instructors, rooms = set(), set()
+    for sid in subject_ids:
+        instructors.add(subjects_by_id[sid]['instructor_id'])
+        for s in drafts.get(sid, ()):
+            instructors.add(s['instructor_id'])
+            rooms.add(s['room_id'])
 
-# ---------- Time slots ----------
-def generate_time_slots_fixed(start_time_dt, end_time_dt, session_length_minutes=90, step_minutes=30):
-    """Optimized time slot generation"""
-    slots = []
-    current = start_time_dt
-    
-    # Pre-calculate total minutes for faster computation
-    total_minutes = int((end_time_dt - start_time_dt).total_seconds() / 60)
-    n_slots = total_minutes // step_minutes
-    
-    for i in range(n_slots):
-        slot_start = start_time_dt + timedelta(minutes=i * step_minutes)
-        slot_end = slot_start + timedelta(minutes=session_length_minutes)
-        
-        if slot_end > end_time_dt:
-            break
-            
-        slots.append((
-            slot_start.strftime("%H:%M"),
-            slot_end.strftime("%H:%M")
-        ))
-    
-    return slots
-
-
-# ---------- Conflicts ----------
-def get_conflicting_schedule_ids():
-    detect_and_save_conflicts()
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT schedule1_id, schedule2_id FROM conflicts")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    ids = set()
-    for r in rows:
-        if r[0] is not None:
-            ids.add(r[0])
-        if r[1] is not None:
-            ids.add(r[1])
-    return list(ids)
+    neighbours = set()
+    for sid, subj in subjects_by_id.items():
+        if subj['instructor_id'] in instructors or any(
+                s['instructor_id'] in instructors or s['room_id'] in rooms for s in drafts.get(sid, ())):
+            neighbours.add(sid)
+    return neighbours
 
 
 # ---------- Routes ----------
@@ -536,61 +271,910 @@ def auto_scheduler_home():
             s['end_time_12'] = str(s['end_time'] or '')
 
     conflicting_schedule_ids = get_conflicting_schedule_ids()
-    return render_template("admin/auto_scheduler.html", schedules=schedules, conflicting_schedule_ids=conflicting_schedule_ids)
+    job_id = request.args.get('job_id', type=int)
+    batch_id = request.args.get('batch_id', type=int)
+    preview = get_preview(session.get('user_id'))
+    return render_template("admin/auto_scheduler.html", schedules=schedules,
+                           conflicting_schedule_ids=conflicting_schedule_ids, job_id=job_id, batch_id=batch_id,
+                           preview=preview.to_dict() if preview else None)
+
+
+def _wants_json():
+    return request.is_json or request.accept_mimetypes.best == 'application/json'
+
+
+def _read_generation_form(semesters):
+    """Validate the options shared by single and batch generation; returns ``(params, error)``
+
+    ``params`` holds every option except the semester, which the caller sets.
+    """
+    start_time_str = request.form.get("start_time", "07:00")
+    end_time_str = request.form.get("end_time", "19:00")
+    school_year = request.form.get("school_year")
+
+    mode = 'incremental' if request.form.get("mode") == 'incremental' else 'full'
+    subject_ids_str = request.form.get("subject_ids", "")
+
+    error = None
+    if not semesters or not school_year:
+        error = "Semester and school year are required."
+    else:
+        try:
+            if datetime.strptime(start_time_str, "%H:%M") >= datetime.strptime(end_time_str, "%H:%M"):
+                error = "Start time must be earlier than end time."
+        except ValueError:
+            error = "Invalid time format."
+
+    subject_ids = []
+    if not error:
+        try:
+            subject_ids = sorted({int(x) for x in subject_ids_str.replace(',', ' ').split()})
+        except ValueError:
+            error = "Subject IDs must be whole numbers separated by commas."
+
+    seed = None
+    if not error and request.form.get("seed"):
+        try:
+            seed = int(request.form["seed"])
+        except ValueError:
+            error = "Seed must be a whole number."
+
+    time_limit = SOLVER_TIME_LIMIT
+    if not error:
+        try:
+            time_limit = int(request.form.get("time_limit") or SOLVER_TIME_LIMIT)
+            if not 1 <= time_limit <= MAX_SOLVER_TIME_LIMIT:
+                raise ValueError
+        except ValueError:
+            error = f"Time limit must be between 1 and {MAX_SOLVER_TIME_LIMIT} seconds."
+
+    if error:
+        return None, error
+    return {
+        'school_year': school_year,
+        'start_time': start_time_str,
+        'end_time': end_time_str,
+        'solver': 'single' if request.form.get("solver") == 'single' else 'portfolio',
+        'heuristic': request.form.get("heuristic") if request.form.get("heuristic") in HEURISTICS else 'mrv',
+        'value_order': request.form.get("value_order") if request.form.get("value_order") in VALUE_ORDERS else 'lcv',
+        'optimize': request.form.get("optimize") == 'soft',
+        'preview': bool(request.form.get("preview")),
+        'mode': mode,
+        'subject_ids': subject_ids,
+        'time_limit': time_limit,
+        'seed': seed,
+    }, None
+
+
+def _generation_error(message, status=400, job_id=None):
+    if _wants_json():
+        body = {'error': message}
+        if job_id is not None:
+            body['job_id'] = job_id
+        return jsonify(body), status
+    flash(message, "warning")
+    return redirect(url_for('auto_scheduler.auto_scheduler_home', job_id=job_id))
 
 
 @auto_scheduler_bp.route('/generate', methods=['POST'])
 def generate_schedule():
-    global instructor_status, _compatibility_cache, _backtrack_cache, _time_cache
-    
-    # Clear caches at start of generation
-    _compatibility_cache.clear()
-    _backtrack_cache.clear()
-    _time_cache.clear()
-
+    """Validate the form and queue a generation job; the solve runs in the background"""
     if not is_admin():
         return redirect(url_for('login'))
 
-    start_time_str = request.form.get("start_time", "07:00")
-    end_time_str = request.form.get("end_time", "19:00")
     semester = request.form.get("semester")
-    school_year = request.form.get("school_year")
+    params, error = _read_generation_form([semester] if semester else [])
+    if error:
+        return _generation_error(error)
+    params['semester'] = semester
+    job, running_job_id = submit_generation_job(params, session.get('user_id'))
+
+    if job is None:
+        message = f"A generation job for {semester} {params['school_year']} is already running (job #{running_job_id})."
+        return _generation_error(message, 409, running_job_id)
+
+    if _wants_json():
+        return jsonify({
+            'job_id': job.job_id,
+            'status_url': url_for('auto_scheduler.job_status', job_id=job.job_id)
+        }), 202
+    flash(f"Schedule {'preview' if params['preview'] else 'generation'} started (job #{job.job_id}).", "info")
+    return redirect(url_for('auto_scheduler.auto_scheduler_home', job_id=job.job_id))
+
+
+@auto_scheduler_bp.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """Queue one job per checked semester of the school year, solved in turn on shared inputs"""
+    if not is_admin():
+        return redirect(url_for('login'))
+
+    semesters = list(dict.fromkeys(request.form.getlist("semesters")))
+    params, error = _read_generation_form(semesters)
+    if not error and params['preview']:
+        error = "Previews hold one schedule at a time; preview the semesters one by one."
+    if error:
+        return _generation_error(error)
+    jobs, running_job_id = submit_batch_job([dict(params, semester=semester) for semester in semesters],
+                                            session.get('user_id'))
+
+    if jobs is None:
+        message = f"A generation job for one of these semesters is already running (job #{running_job_id})."
+        return _generation_error(message, 409, running_job_id)
+
+    batch_id = jobs[0].batch_id
+    if _wants_json():
+        return jsonify({
+            'batch_id': batch_id,
+            'job_ids': [job.job_id for job in jobs],
+            'status_url': url_for('auto_scheduler.batch_status', batch_id=batch_id)
+        }), 202
+    flash(f"Batch generation of {len(jobs)} semesters started (batch #{batch_id}).", "info")
+    return redirect(url_for('auto_scheduler.auto_scheduler_home', batch_id=batch_id))
+
+
+@auto_scheduler_bp.route('/batches/<int:batch_id>')
+def batch_status(batch_id):
+    """Status and results of every term of a batch"""
+    if not is_admin():
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    batch = get_batch_status(batch_id)
+    if batch is None:
+        return jsonify({'error': f"Batch #{batch_id} not found."}), 404
+    return jsonify(batch)
+
+
+@auto_scheduler_bp.route('/batches/<int:batch_id>/cancel', methods=['POST'])
+def cancel_batch(batch_id):
+    if not is_admin():
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    jobs = [job for job in list(_jobs.values()) if job.batch_id == batch_id]
+    if not jobs:
+        return jsonify({'error': f"Batch #{batch_id} is not running on this server."}), 404
+    for job in jobs:
+        if job.status not in JOB_FINISHED_STATUSES:
+            job.cancel()
+    return jsonify(get_batch_status(batch_id)), 202
+
+
+@auto_scheduler_bp.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    if not is_admin():
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    job = get_job_status(job_id)
+    if job is None:
+        return jsonify({'error': f"Job #{job_id} not found."}), 404
+    return jsonify(job)
+
+
+@auto_scheduler_bp.route('/cache/clear', methods=['POST'])
+def clear_solution_cache():
+    if not is_admin():
+        return redirect(url_for('login'))
+    cleared = _solution_cache.clear()
+    message = f"Cleared {cleared} cached schedule{'s' if cleared != 1 else ''}."
+    if _wants_json():
+        return jsonify({'cleared': cleared})
+    flash(message, "info")
+    return redirect(url_for('auto_scheduler.auto_scheduler_home'))
+
+
+@auto_scheduler_bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not is_admin():
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f"Job #{job_id} is not running on this server."}), 404
+    if job.status in JOB_FINISHED_STATUSES:
+        return jsonify({'error': f"Job #{job_id} has already finished."}), 409
+    job.cancel()
+    return jsonify(job.to_dict()), 202
+
+
+@auto_scheduler_bp.route('/jobs/<int:job_id>/metrics')
+def job_metrics(job_id):
+    """Solver telemetry of a finished job: counters, cache hit rates, domain sizes and phase timings"""
+    if not is_admin():
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    job = get_job_metrics(job_id)
+    if job is None:
+        return jsonify({'error': f"Job #{job_id} not found."}), 404
+    return jsonify(job)
 
-    if not semester or not school_year:
-        flash("Semester and school year are required.", "warning")
+
+@auto_scheduler_bp.route('/preview')
+def preview_status():
+    """The admin's current preview: summary plus the moved, added and removed sessions"""
+    if not is_admin():
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    preview = get_preview(session.get('user_id'))
+    if preview is None:
+        return jsonify({'error': "There is no preview on this server."}), 404
+    return jsonify(preview.to_dict())
+
+
+@auto_scheduler_bp.route('/preview/apply', methods=['POST'])
+def apply_preview():
+    """Write the previewed schedule to the drafts as it was solved, without solving again"""
+    if not is_admin():
+        return redirect(url_for('login'))
+    user_id = session.get('user_id')
+    preview = get_preview(user_id)
+
+    error, status = None, 409
+    if preview is None:
+        error, status = "There is no preview to apply on this server.", 404
+    elif preview.expired:
+        take_preview(user_id, preview)
+        error = (f"The preview of job #{preview.job_id} is older than {PREVIEW_TTL_MINUTES} minutes; "
+                 f"preview the schedule again.")
+    elif preview.term in _active_terms:
+        error = (f"A generation job for {preview.semester} {preview.school_year} is running "
+                 f"(job #{_active_terms[preview.term]}); apply the preview after it finishes.")
+    else:
+        approved_schedules = get_approved_schedules(preview.semester, preview.school_year)
+        drafts = get_draft_schedules(preview.semester, preview.school_year)
+        if input_fingerprint(preview.params, load_reference_data(), approved_schedules,
+                             drafts) != preview.fingerprint:
+            take_preview(user_id, preview)
+            error = ("Subjects, instructors, rooms, approved schedules or drafts changed since the preview "
+                     "was made; preview the schedule again.")
+        elif take_preview(user_id, preview) is None:
+            error = "The preview was applied or replaced in the meantime."
+
+    if error:
+        if _wants_json():
+            return jsonify({'error': error}), status
+        flash(error, "warning")
         return redirect(url_for('auto_scheduler.auto_scheduler_home'))
 
+    counts = write_schedule(preview.semester, preview.school_year, preview.schedule)
+    logger.info("auto-scheduler: applied the preview of job #%s; %s", preview.job_id, counts)
+    if _wants_json():
+        return jsonify({'job_id': preview.job_id, **counts})
+    flash(f"Applied the preview of job #{preview.job_id}: {counts['rows_updated']} drafts moved, "
+          f"{counts['rows_inserted']} added and {counts['rows_deleted']} removed.", "success")
+    return redirect(url_for('auto_scheduler.auto_scheduler_home'))
+
+
+@auto_scheduler_bp.route('/preview/discard', methods=['POST'])
+def discard_preview():
+    if not is_admin():
+        return redirect(url_for('login'))
+    preview = take_preview(session.get('user_id'))
+    message = f"Discarded the preview of job #{preview.job_id}." if preview else "There is no preview to discard."
+    if _wants_json():
+        return jsonify({'discarded': preview is not None})
+    flash(message, "info")
+    return redirect(url_for('auto_scheduler.auto_scheduler_home'))
+
+
+# ---------- Generation jobs ----------
+# Each job keeps its solver state in its own SolverContext, so jobs for different
+# terms may run side by side; a term never has more than one active job
+MAX_CONCURRENT_JOBS = 2
+_job_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix='auto-scheduler')
+_jobs = {}
+_active_terms = {}
+_jobs_lock = threading.Lock()
+_job_table_ready = False
+_heartbeat_thread = None
+
+MAX_TRACKED_JOBS = 100
+JOB_SAVE_INTERVAL = 2.0        # seconds between progress writes to the job table
+JOB_HEARTBEAT_INTERVAL = 60    # seconds between heartbeats of a process's unfinished jobs
+JOB_STALE_AFTER_MINUTES = 15   # unfinished jobs without a heartbeat are ignored
+JOB_FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+SOLVER_TIME_LIMIT = 60         # default seconds a job may spend before writing what it has
+MAX_SOLVER_TIME_LIMIT = 1800
+
+_solution_cache = SolutionCache()
+
+def ensure_job_table():
+    global _job_table_ready
+    if _job_table_ready:
+        return
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS scheduler_jobs (
+            job_id INT AUTO_INCREMENT PRIMARY KEY,
+            semester VARCHAR(50) NOT NULL,
+            school_year VARCHAR(20) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            phase VARCHAR(50),
+            progress TEXT,
+            message TEXT,
+            params TEXT,
+            metrics TEXT,
+            batch_id INT NULL,
+            created_by INT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            finished_at DATETIME NULL,
+            KEY idx_scheduler_jobs_term (semester, school_year, status),
+            KEY idx_scheduler_jobs_batch (batch_id)
+        )
+    """)
+    # Tables created before solver telemetry existed lack the metrics column
+    cur.execute("SHOW COLUMNS FROM scheduler_jobs LIKE 'metrics'")
+    if not cur.fetchall():
+        cur.execute("ALTER TABLE scheduler_jobs ADD COLUMN metrics TEXT AFTER params")
+    # ... and those created before batch generation the batch_id column
+    cur.execute("SHOW COLUMNS FROM scheduler_jobs LIKE 'batch_id'")
+    if not cur.fetchall():
+        cur.execute("ALTER TABLE scheduler_jobs ADD COLUMN batch_id INT NULL AFTER metrics, "
+                    "ADD KEY idx_scheduler_jobs_batch (batch_id)")
+    conn.commit()
+    cur.close()
+    conn.close()
+    _job_table_ready = True
+
+
+class GenerationJob:
+    """Live state of one generation job, mirrored to the scheduler_jobs table"""
+
+    def __init__(self, job_id, params, user_id=None, batch_id=None):
+        self.job_id = job_id
+        self.params = params
+        self.user_id = user_id
+        self.batch_id = batch_id
+        self.status = 'queued'
+        self.phase = 'queued'
+        self.progress = {}
+        self.message = None
+        self.metrics = None
+        self._last_save = 0.0
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Ask the solver to stop at its next check; nothing is written afterwards"""
+        self._cancel.set()
+
+    @property
+    def term(self):
+        return (self.params['semester'], self.params['school_year'])
+
+    def set_phase(self, phase):
+        self.phase = phase
+        self.status = 'running'
+        self.save()
+
+    def update(self, **counters):
+        self.progress.update(counters)
+        if time.time() - self._last_save >= JOB_SAVE_INTERVAL:
+            self.save()
+
+    def finish(self, status, message):
+        self.status = status
+        self.phase = status
+        self.message = message
+        self.save(finished=True)
+
+    def save(self, finished=False):
+        self._last_save = time.time()
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.execute(f"""
+                UPDATE scheduler_jobs
+                SET status = %s, phase = %s, progress = %s, message = %s, metrics = %s,
+                    updated_at = CURRENT_TIMESTAMP{', finished_at = CURRENT_TIMESTAMP' if finished else ''}
+                WHERE job_id = %s
+            """, (self.status, self.phase, json.dumps(self.progress), self.message,
+                  json.dumps(self.metrics) if self.metrics is not None else None, self.job_id))
+            conn.commit()
+            cur.close()
+            conn.close()
+        except mysql.connector.Error as e:
+            logger.warning("could not persist auto-scheduler job #%s: %s", self.job_id, e)
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'batch_id': self.batch_id,
+            'semester': self.params['semester'],
+            'school_year': self.params['school_year'],
+            'status': self.status,
+            'phase': self.phase,
+            'progress': dict(self.progress),
+            'message': self.message,
+        }
+
+
+def submit_generation_job(params, user_id):
+    """Queue a generation job; returns ``(job, None)`` or ``(None, running_job_id)``"""
+    jobs, running_job_id = _queue_jobs([params], user_id)
+    if jobs is None:
+        return None, running_job_id
+    _job_executor.submit(_run_job, jobs[0])
+    return jobs[0], None
+
+
+def submit_batch_job(term_params, user_id):
+    """Queue one job per term of a batch; they run one after another on a single worker
+
+    Returns ``(jobs, None)``, or ``(None, running_job_id)`` if any of the terms
+    already has an active job, in which case nothing is queued.
+    """
+    jobs, running_job_id = _queue_jobs(term_params, user_id, batch=True)
+    if jobs is None:
+        return None, running_job_id
+    _job_executor.submit(_run_batch, jobs)
+    return jobs, None
+
+
+def _queue_jobs(term_params, user_id, batch=False):
+    """Insert a job row per entry of ``term_params`` and mark their terms active"""
+    ensure_job_table()
+    terms = [(params['semester'], params['school_year']) for params in term_params]
+
+    with _jobs_lock:
+        for term in terms:
+            if term in _active_terms:
+                return None, _active_terms[term]
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        # Jobs started by other server processes still count while they heartbeat
+        for term in terms:
+            cur.execute("""
+                SELECT job_id FROM scheduler_jobs
+                WHERE semester = %s AND school_year = %s
+                  AND status IN ('queued', 'running')
+                  AND updated_at >= NOW() - INTERVAL %s MINUTE
+                ORDER BY job_id DESC LIMIT 1
+            """, term + (JOB_STALE_AFTER_MINUTES,))
+            row = cur.fetchone()
+            if row:
+                cur.close()
+                conn.close()
+                return None, row[0]
+
+        jobs = []
+        for params, term in zip(term_params, terms):
+            cur.execute("""
+                INSERT INTO scheduler_jobs (semester, school_year, status, phase, progress, params, created_by)
+                VALUES (%s, %s, 'queued', 'queued', '{}', %s, %s)
+            """, term + (json.dumps(params), user_id))
+            jobs.append(GenerationJob(cur.lastrowid, params, user_id))
+        if batch:
+            # A batch is known by the ID of its first job
+            batch_id = jobs[0].job_id
+            placeholders = ','.join(['%s'] * len(jobs))
+            cur.execute(f"UPDATE scheduler_jobs SET batch_id = %s WHERE job_id IN ({placeholders})",
+                        (batch_id,) + tuple(job.job_id for job in jobs))
+            for job in jobs:
+                job.batch_id = batch_id
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        for job in jobs:
+            _jobs[job.job_id] = job
+            _active_terms[job.term] = job.job_id
+        _prune_finished_jobs()
+        _ensure_heartbeat()
+
+    return jobs, None
+
+
+def _ensure_heartbeat():
+    global _heartbeat_thread
+    if _heartbeat_thread is None:
+        _heartbeat_thread = threading.Thread(target=_heartbeat_jobs, name='auto-scheduler-heartbeat', daemon=True)
+        _heartbeat_thread.start()
+
+
+def _heartbeat_jobs():
+    """Touch the rows of this process's unfinished jobs so other processes never take them for stale
+
+    Runs on its own thread: domain building, AC-3 and a long search report no
+    progress for minutes, and a batch's queued jobs report none until they start.
+    """
+    while True:
+        time.sleep(JOB_HEARTBEAT_INTERVAL)
+        with _jobs_lock:
+            job_ids = list(_active_terms.values())
+        if not job_ids:
+            continue
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            placeholders = ','.join(['%s'] * len(job_ids))
+            cur.execute(f"UPDATE scheduler_jobs SET updated_at = CURRENT_TIMESTAMP WHERE job_id IN ({placeholders})",
+                        tuple(job_ids))
+            conn.commit()
+            cur.close()
+            conn.close()
+        except mysql.connector.Error as e:
+            logger.warning("could not refresh the auto-scheduler job heartbeat: %s", e)
+
+
+def _prune_finished_jobs():
+    finished = [jid for jid, j in _jobs.items() if j.status in JOB_FINISHED_STATUSES]
+    for jid in finished[:max(0, len(_jobs) - MAX_TRACKED_JOBS)]:
+        del _jobs[jid]
+
+
+def _run_job(job, reference=None):
+    context = SolverContext()
     try:
-        start_time = datetime.strptime(start_time_str, "%H:%M")
-        end_time = datetime.strptime(end_time_str, "%H:%M")
-        if start_time >= end_time:
-            flash("Start time must be earlier than end time.", "warning")
-            return redirect(url_for('auto_scheduler.auto_scheduler_home'))
-    except ValueError:
-        flash("Invalid time format.", "warning")
-        return redirect(url_for('auto_scheduler.auto_scheduler_home'))
+        category, message = run_generation(job.params, job, context, reference)
+        job.metrics = context.metrics.to_dict()
+        if 'preview' in job.progress:
+            changes = job.progress['preview']
+            message += (f" Preview only, nothing was written: {changes['moved']} sessions would move, "
+                        f"{changes['added']} be added and {changes['removed']} be removed.")
+        if category == 'cancelled':
+            job.finish('cancelled', message)
+        else:
+            job.finish('done' if category in ('success', 'warning') else 'failed', message)
+    except Exception as e:
+        logger.exception("auto-scheduler job #%s crashed", job.job_id)
+        job.metrics = context.metrics.to_dict()
+        job.finish('failed', f"Generation crashed: {type(e).__name__}: {e}")
+    finally:
+        logger.info("auto-scheduler job #%s %s; metrics: %s", job.job_id, job.status, json.dumps(job.metrics))
+        with _jobs_lock:
+            _active_terms.pop(job.term, None)
+
+
+def _run_batch(jobs):
+    """Run the jobs of a batch in order, loading subjects, instructors and rooms once for all terms"""
+    try:
+        reference = load_reference_data()
+    except Exception as e:
+        logger.exception("auto-scheduler batch #%s could not load its inputs", jobs[0].batch_id)
+        for job in jobs:
+            job.finish('failed', f"Loading inputs failed: {type(e).__name__}: {e}")
+            with _jobs_lock:
+                _active_terms.pop(job.term, None)
+        return
+    for job in jobs:
+        _run_job(job, reference)
+
+
+def get_job_status(job_id):
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job.to_dict()
+
+    ensure_job_table()
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    cur.execute("""
+        SELECT job_id, batch_id, semester, school_year, status, phase, progress, message,
+               created_at, updated_at, finished_at
+        FROM scheduler_jobs WHERE job_id = %s
+    """, (job_id,))
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    if not row:
+        return None
+    row['progress'] = json.loads(row['progress'] or '{}')
+    for key in ('created_at', 'updated_at', 'finished_at'):
+        if row[key] is not None:
+            row[key] = str(row[key])
+    return row
 
-    # --- Get approved schedules to avoid conflicts
-    approved_schedules = get_approved_schedules(semester, school_year)
-    print(f"[diagnostic] Loaded {len(approved_schedules)} approved schedules to avoid conflicts")
 
-    # --- Generate time slots with bulk operations
-    slots_60 = generate_time_slots_fixed(start_time, end_time, session_length_minutes=60, step_minutes=30)
-    slots_90 = generate_time_slots_fixed(start_time, end_time, session_length_minutes=90, step_minutes=30)
-
-    # Use set for O(1) lookups
-    time_slots = []
-    seen = set()
-    for s, e in slots_60 + slots_90:
-        key = f"{s}-{e}"
-        if key not in seen:
-            seen.add(key)
-            time_slots.append((s, e))
+def get_batch_status(batch_id):
+    """Every term of a batch with its job status, plus the status of the batch as a whole"""
+    ensure_job_table()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT job_id FROM scheduler_jobs WHERE batch_id = %s ORDER BY job_id", (batch_id,))
+    job_ids = [row[0] for row in cur.fetchall()]
+    cur.close()
+    conn.close()
+    if not job_ids:
+        return None
 
-    if not time_slots:
-        flash("No time slots available.", "warning")
-        return redirect(url_for('auto_scheduler.auto_scheduler_home'))
+    jobs = [get_job_status(job_id) for job_id in job_ids]
+    statuses = {job['status'] for job in jobs}
+    if not statuses <= set(JOB_FINISHED_STATUSES):
+        status = 'running'
+    elif 'failed' in statuses:
+        status = 'failed'
+    else:
+        status = 'cancelled' if statuses == {'cancelled'} else 'done'
+    return {'batch_id': batch_id, 'status': status, 'jobs': jobs}
+
+
+def get_job_metrics(job_id):
+    """Telemetry of a job; ``metrics`` stays None until the job has finished"""
+    job = _jobs.get(job_id)
+    if job is not None:
+        return {'job_id': job.job_id, 'status': job.status, 'metrics': job.metrics}
+
+    ensure_job_table()
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT job_id, status, metrics FROM scheduler_jobs WHERE job_id = %s", (job_id,))
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    if not row:
+        return None
+    row['metrics'] = json.loads(row['metrics']) if row['metrics'] else None
+    return row
+
+
+# ---------- Writing drafts ----------
+WRITE_BATCH_ROWS = 500   # rows per multi-row UPDATE or DELETE statement
+DRAFT_FIELDS = ('instructor_id', 'room_id', 'day_of_week', 'start_time', 'end_time')
+
+def _draft_key(row):
+    """What a draft row schedules, independent of its schedule_id"""
+    return (row['instructor_id'], row['room_id'], row['day_of_week'],
+            parse_time_str(str(row['start_time'])), parse_time_str(str(row['end_time'])))
+
+
+def diff_drafts(existing, schedule):
+    """Row changes that turn the ``existing`` drafts into ``schedule``
+
+    ``existing`` maps subject IDs to their current draft rows. A row that already
+    matches one of the subject's new sessions is left alone; the subject's other
+    rows are updated in place to its other sessions, so their schedule IDs and
+    the conflicts that refer to them survive, and only the surplus is inserted or
+    deleted. Returns ``(inserts, updates, deletes, unchanged)`` with new row dicts,
+    ``(schedule_id, row)`` pairs, schedule IDs and a count.
+    """
+    inserts, updates, deletes, unchanged = [], [], [], 0
+    for var, group in schedule.items():
+        old_rows = {row['schedule_id']: _draft_key(row) for row in existing.get(int(var), ())}
+        new_rows = []
+        for row in map(Session.as_row, group):
+            key = _draft_key(row)
+            match = next((sid for sid, old_key in old_rows.items() if old_key == key), None)
+            if match is None:
+                new_rows.append(row)
+            else:
+                del old_rows[match]
+                unchanged += 1
+        old_ids = list(old_rows)
+        updates.extend(zip(old_ids, new_rows))
+        deletes.extend(old_ids[len(new_rows):])
+        inserts.extend(new_rows[len(old_ids):])
+    return inserts, updates, deletes, unchanged
+
+
+def _select_drafts(cur, semester, school_year, subject_ids, lock=False):
+    """Unapproved draft rows of ``subject_ids`` by subject ID, locked for update if ``lock``"""
+    existing = {}
+    subject_ids = [int(x) for x in subject_ids]
+    if subject_ids:
+        placeholders = ','.join(['%s'] * len(subject_ids))
+        cur.execute(f"""
+            SELECT schedule_id, subject_id, instructor_id, room_id, day_of_week, start_time, end_time
+            FROM schedules
+            WHERE subject_id IN ({placeholders})
+            AND semester = %s AND school_year = %s
+            AND (approved IS NULL OR approved = 0)
+            ORDER BY schedule_id
+            {'FOR UPDATE' if lock else ''}
+        """, tuple(subject_ids) + (semester, school_year))
+        for row in cur.fetchall():
+            existing.setdefault(row['subject_id'], []).append(row)
+    return existing
+
+
+def _batches(items):
+    for i in range(0, len(items), WRITE_BATCH_ROWS):
+        yield items[i:i + WRITE_BATCH_ROWS]
+
+
+def write_schedule(semester, school_year, schedule):
+    """Bring the unapproved drafts of the scheduled subjects in line with ``schedule``
+
+    The current drafts are read and locked, diffed against the new schedule, and
+    only the needed inserts, updates and deletes are applied, all in one
+    transaction. A subject mapped to no sessions loses its drafts. Returns the
+    number of rows inserted, updated, deleted and left unchanged.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        existing = _select_drafts(cur, semester, school_year, schedule, lock=True)
+        inserts, updates, deletes, unchanged = diff_drafts(existing, schedule)
+
+        for batch in _batches(deletes):
+            placeholders = ','.join(['%s'] * len(batch))
+            # Conflicts of removed rows would otherwise point at nothing
+            cur.execute(f"""
+                DELETE FROM conflicts
+                WHERE schedule1_id IN ({placeholders}) OR schedule2_id IN ({placeholders})
+            """, tuple(batch) * 2)
+            cur.execute(f"DELETE FROM schedules WHERE schedule_id IN ({placeholders})", tuple(batch))
+
+        for batch in _batches(updates):
+            # One CASE per column moves every row of the batch in a single statement
+            assignments, params = [], []
+            for field in DRAFT_FIELDS:
+                assignments.append(f"{field} = CASE schedule_id " + "WHEN %s THEN %s " * len(batch) + "END")
+                for schedule_id, row in batch:
+                    params.extend((schedule_id, row[field]))
+            placeholders = ','.join(['%s'] * len(batch))
+            params.extend(schedule_id for schedule_id, _ in batch)
+            cur.execute(f"UPDATE schedules SET {', '.join(assignments)} WHERE schedule_id IN ({placeholders})",
+                        tuple(params))
+
+        if inserts:
+            # mysql.connector sends a batched INSERT as multi-row statements
+            insert_q = """
+                INSERT INTO schedules
+                (subject_id, instructor_id, room_id, day_of_week, start_time, end_time, semester, school_year)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """
+            cur.executemany(insert_q, [
+                (s['subject_id'], s['instructor_id'], s['room_id'],
+                 s['day_of_week'], s['start_time'], s['end_time'],
+                 semester, school_year)
+                for s in inserts
+            ])
+
+        conn.commit()
+        return {'rows_inserted': len(inserts), 'rows_updated': len(updates),
+                'rows_deleted': len(deletes), 'rows_unchanged': unchanged}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# ---------- Previews ----------
+# A preview job solves as usual but keeps its schedule here, one per admin and
+# in this server process, until the admin applies or discards it
+PREVIEW_TTL_MINUTES = 30
+_previews = {}
+_previews_lock = threading.Lock()
+
+def _session_view(row, names):
+    """A draft row or planned session as a preview shows it, times as HH:MM"""
+    return {
+        'subject_id': row['subject_id'],
+        'subject_name': names['subjects'].get(row['subject_id']),
+        'instructor_name': names['instructors'].get(row['instructor_id']),
+        'room_number': names['rooms'].get(row['room_id']),
+        'day_of_week': row['day_of_week'],
+        'start_time': parse_time_str(str(row['start_time'])),
+        'end_time': parse_time_str(str(row['end_time'])),
+    }
+
+
+def preview_changes(existing, schedule, names):
+    """Sessions that writing ``schedule`` would move, add and remove
+
+    Pairs rows exactly as write_schedule does: a moved session is a draft row it
+    would update in place. ``names`` maps subject, instructor and room IDs to
+    what the admin recognises them by.
+    """
+    inserts, updates, deletes, unchanged = diff_drafts(existing, schedule)
+    old_rows = {row['schedule_id']: row for rows in existing.values() for row in rows}
+    return {
+        'moved': [{'from': _session_view(old_rows[schedule_id], names), 'to': _session_view(row, names)}
+                  for schedule_id, row in updates],
+        'added': [_session_view(row, names) for row in inserts],
+        'removed': [_session_view(old_rows[schedule_id], names) for schedule_id in deletes],
+        'unchanged': unchanged,
+    }
+
+
+class GenerationPreview:
+    """A solved schedule held back from the drafts until its admin applies it
+
+    Keeps the job's ``params`` and the ``fingerprint`` of the inputs it was
+    solved from, the term's drafts included, so applying can tell whether those
+    inputs changed since.
+    """
 
+    def __init__(self, job_id, params, fingerprint, schedule, changes):
+        self.job_id = job_id
+        self.params = params
+        self.fingerprint = fingerprint
+        self.semester = params['semester']
+        self.school_year = params['school_year']
+        self.schedule = schedule
+        self.changes = changes
+        self.created_at = datetime.now()
+
+    @property
+    def term(self):
+        return (self.semester, self.school_year)
+
+    @property
+    def expired(self):
+        return datetime.now() - self.created_at > timedelta(minutes=PREVIEW_TTL_MINUTES)
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'semester': self.semester,
+            'school_year': self.school_year,
+            'created_at': self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'expired': self.expired,
+            'summary': {kind: len(self.changes[kind]) for kind in ('moved', 'added', 'removed')},
+            **self.changes,
+        }
+
+
+def store_preview(user_id, preview):
+    with _previews_lock:
+        _previews[user_id] = preview
+
+
+def get_preview(user_id):
+    with _previews_lock:
+        return _previews.get(user_id)
+
+
+def take_preview(user_id, preview=None):
+    """Remove and return the admin's preview; with ``preview``, only if it is still that one"""
+    with _previews_lock:
+        current = _previews.get(user_id)
+        if current is None or (preview is not None and current is not preview):
+            return None
+        return _previews.pop(user_id)
+
+
+# ---------- Reference data ----------
+class ReferenceData:
+    """Inputs shared by every term: subjects with course types, instructors, rooms and room programs
+
+    A job loads them once, and a batch once for all of its terms, together with
+    the indexes derived from them. Each term then only loads its approved
+    schedules.
+    """
+
+    def __init__(self, subjects, instructors, rooms, room_program_rows):
+        self.subjects = subjects
+        self.instructors = instructors
+        self.rooms = rooms
+        self.room_program_rows = room_program_rows
+
+        # --- Room-to-program mapping
+        self.room_programs_map = {}
+        for rp in room_program_rows:
+            pname = (rp['program_name'] or '').strip().upper()
+            self.room_programs_map.setdefault(rp['room_id'], []).append(pname)
+
+        self.max_loads = {ins['instructor_id']: int(ins['max_load_units']) for ins in instructors}
+        self.statuses = {ins['instructor_id']: (str(ins.get('status', '') or '')).lower() for ins in instructors}
+        self._catalogues = {}
+
+    def term_subjects(self, approved_schedules):
+        """Subjects still to schedule in a term: those without an approved schedule in it"""
+        approved = {s['subject_id'] for s in approved_schedules}
+        return [subj for subj in self.subjects if subj['subject_id'] not in approved]
+
+    def catalogue(self, time_slots, blocked_sessions):
+        """Slot catalogue avoiding ``blocked_sessions``; terms with the same time slots share its arrays"""
+        key = tuple(time_slots)
+        base = self._catalogues.get(key)
+        if base is None:
+            base = self._catalogues[key] = SlotCatalogue(time_slots, ())
+        return base.blocking(blocked_sessions)
+
+
+def input_fingerprint(params, reference, approved_schedules, drafts=None):
+    """Fingerprint of a term's generation inputs, see generation_fingerprint()
+
+    ``drafts`` is the term's drafts by subject ID, as from get_draft_schedules().
+    """
+    if drafts is not None:
+        drafts = [row for rows in drafts.values() for row in rows]
+    return generation_fingerprint(params, reference.term_subjects(approved_schedules), reference.instructors,
+                                  reference.rooms, reference.room_program_rows, approved_schedules, drafts)
+
+
+def load_reference_data():
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
 
@@ -600,11 +1184,8 @@ def generate_schedule():
                c.course_type
         FROM subjects sb
         LEFT JOIN courses c ON sb.code = c.course_code
-        LEFT JOIN schedules sc ON sb.subject_id = sc.subject_id 
-            AND sc.semester = %s AND sc.school_year = %s AND sc.approved = 1
         WHERE sb.instructor_id IS NOT NULL
-          AND (sc.schedule_id IS NULL)
-    """, (semester, school_year))
+    """)
     subjects = cur.fetchall()
 
     cur.execute("SELECT instructor_id, name, status, max_load_units FROM instructors")
@@ -613,321 +1194,319 @@ def generate_schedule():
     cur.execute("SELECT room_id, room_number, room_type FROM rooms")
     rooms = cur.fetchall()
 
-    # --- Room-to-program mapping with dict comprehension
     cur.execute("SELECT room_id, program_name FROM room_programs")
     room_program_rows = cur.fetchall()
-    room_programs_map = {}
-    for rp in room_program_rows:
-        rid = rp['room_id']
-        pname = (rp['program_name'] or '').strip().upper()
-        room_programs_map.setdefault(rid, []).append(pname)
-
-    # Pre-compute instructor data
-    max_loads = {ins['instructor_id']: int(ins['max_load_units']) for ins in instructors}
-    instructor_status = {ins['instructor_id']: (str(ins.get('status', '') or '')).lower() for ins in instructors}
-
-    instructor_load = {}
-    domains = {}
-    skipped_subjects = []
-
-    # Pre-compute room type mappings
-    ROOM_TYPE_MAP = {
-        'lecture': 'Lecture',
-        'laboratory': 'Lab',
-        'lab': 'Lab'
-    }
+    cur.close()
+    conn.close()
+    return ReferenceData(subjects, instructors, rooms, room_program_rows)
 
-    # Pre-filter rooms by type for faster access
-    lecture_rooms = [r for r in rooms if r['room_type'] == ROOM_TYPE_MAP['lecture']]
-    lab_rooms = [r for r in rooms if r['room_type'] == ROOM_TYPE_MAP['laboratory']]
 
-    # Control randomness for reproducibility during testing
-    try:
-        random.seed(time.time())
-    except Exception:
-        random.seed(0)
+# ---------- Generation pipeline ----------
+def run_generation(params, job, context, reference=None):
+    """Build domains, propagate, search and write drafts; returns ``(category, message)``
 
-    # ---------- Optimized domain builder ----------
-    def build_domain_for_subject(subj):
-        sid = subj['subject_id']
-        instr_id = subj.get('instructor_id')
-        local_domain = []
-        if not instr_id or instr_id not in max_loads:
-            return str(sid), local_domain
-
-        status = instructor_status.get(instr_id, '')
-        subj_program = (subj.get('course') or '').strip().upper()
-        subj_type = (subj.get('course_type') or 'major').lower()
-        units = int(subj.get('units', 3))
-
-        # MAJOR SUBJECTS: 5 hours per week (3 units = 3 hours lecture + 2 hours lab)
-        if subj_type == 'major' and units == 3:
-            lecture_candidates = []
-            lab_candidates = []
-
-            # LECTURE SESSIONS (MWF - 1 hour each)
-            available_lecture_rooms = lecture_rooms
-            if not available_lecture_rooms:
-                available_lecture_rooms = lab_rooms
-
-            for room in available_lecture_rooms:
-                allowed_programs = room_programs_map.get(room['room_id'], [])
-                if allowed_programs and subj_program not in allowed_programs:
-                    continue
-                    
-                for (start, end) in time_slots:
-                    start_dt = datetime.strptime(start, "%H:%M")
-                    end_dt = datetime.strptime(end, "%H:%M")
-                    duration = (end_dt - start_dt).seconds / 60
-                    
-                    # Major lecture: 1 hour sessions (45-70 minutes)
-                    if not (45 <= duration <= 70):
-                        continue
-                    
-                    # Permanent instructor rules
-                    if status == 'permanent':
-                        if intervals_overlap(start, end, "12:00", "13:00"):
-                            continue
-                        if start_dt < datetime.strptime("08:00", "%H:%M") or end_dt > datetime.strptime("17:00", "%H:%M"):
-                            continue
-
-                    # Create MWF lecture sessions
-                    group = []
-                    for day in ['Monday', 'Wednesday', 'Friday']:
-                        session = {
-                            'subject_id': sid,
-                            'instructor_id': instr_id,
-                            'room_id': room['room_id'],
-                            'room_type': room['room_type'],
-                            'day_of_week': day,
-                            'start_time': start,
-                            'end_time': end
-                        }
-                        # Check against approved schedules
-                        if not conflicts_with_approved_schedule(session, approved_schedules):
-                            group.append(session)
-                    
-                    if len(group) == 3:  # All MWF sessions must be valid
-                        lecture_candidates.append(group)
-
-            # LABORATORY SESSIONS (TTh - 1.5 hours each)
-            available_lab_rooms = lab_rooms
-            if not available_lab_rooms:
-                available_lab_rooms = lecture_rooms
-
-            for room in available_lab_rooms:
-                allowed_programs = room_programs_map.get(room['room_id'], [])
-                if allowed_programs and subj_program not in allowed_programs:
-                    continue
-                    
-                for (start, end) in time_slots:
-                    start_dt = datetime.strptime(start, "%H:%M")
-                    end_dt = datetime.strptime(end, "%H:%M")
-                    duration = (end_dt - start_dt).seconds / 60
-                    
-                    # Major lab: 1.5 hour sessions (75-110 minutes)
-                    if not (75 <= duration <= 110):
-                        continue
-                    
-                    # Permanent instructor rules
-                    if status == 'permanent':
-                        if intervals_overlap(start, end, "12:00", "13:00"):
-                            continue
-                        if start_dt < datetime.strptime("08:00", "%H:%M") or end_dt > datetime.strptime("17:00", "%H:%M"):
-                            continue
-
-                    # Create TTh lab sessions
-                    group = []
-                    for day in ['Tuesday', 'Thursday']:
-                        session = {
-                            'subject_id': sid,
-                            'instructor_id': instr_id,
-                            'room_id': room['room_id'],
-                            'room_type': room['room_type'],
-                            'day_of_week': day,
-                            'start_time': start,
-                            'end_time': end
-                        }
-                        # Check against approved schedules
-                        if not conflicts_with_approved_schedule(session, approved_schedules):
-                            group.append(session)
-                    
-                    if len(group) == 2:  # All TTh sessions must be valid
-                        lab_candidates.append(group)
-
-            # Combine lecture + lab for major subjects with early pruning
-            for lec in lecture_candidates[:50]:  # Limit combinations for performance
-                for lab in lab_candidates[:50]:
-                    if _is_valid_combination(lec, lab):
-                        combined_group = lec + lab
-                        local_domain.append(combined_group)
-
-            # Fallback with limited candidates
-            if not local_domain:
-                local_domain.extend(lecture_candidates[:20])
-                local_domain.extend(lab_candidates[:20])
+    Runs on the job worker. A database connection is only held while loading
+    inputs and while writing the result, never during the solve. Solver caches
+    and metrics of the run live in ``context``. With ``params['preview']`` the
+    result is kept as the job owner's preview instead of being written. A batch
+    passes the ``reference`` data it loaded once for all of its terms.
+    """
+    metrics = context.metrics
 
-        else:
-            # NON-MAJOR SUBJECTS
-            if units >= 3:
-                pattern_days = ['Monday', 'Wednesday', 'Friday']
-                target_duration = (45, 70)
-            elif units == 2:
-                pattern_days = ['Tuesday', 'Thursday'] 
-                target_duration = (75, 110)
-            else:
-                pattern_days = ['Monday']
-                target_duration = (45, 70)
-
-            for room in lecture_rooms:
-                allowed_programs = room_programs_map.get(room['room_id'], [])
-                if allowed_programs and subj_program not in allowed_programs:
-                    continue
-
-                for (start, end) in time_slots:
-                    start_dt = datetime.strptime(start, "%H:%M")
-                    end_dt = datetime.strptime(end, "%H:%M")
-                    duration = (end_dt - start_dt).seconds / 60
-
-                    min_dur, max_dur = target_duration
-                    if not (min_dur <= duration <= max_dur):
-                        continue
-                    
-                    if status == 'permanent':
-                        if intervals_overlap(start, end, "12:00", "13:00"):
-                            continue
-                        if start_dt < datetime.strptime("08:00", "%H:%M") or end_dt > datetime.strptime("17:00", "%H:%M"):
-                            continue
-
-                    group = []
-                    for day in pattern_days:
-                        session = {
-                            'subject_id': sid,
-                            'instructor_id': instr_id,
-                            'room_id': room['room_id'],
-                            'room_type': room['room_type'],
-                            'day_of_week': day,
-                            'start_time': start,
-                            'end_time': end
-                        }
-                        # Check against approved schedules
-                        if not conflicts_with_approved_schedule(session, approved_schedules):
-                            group.append(session)
-                    
-                    # Only add complete groups (all pattern days must be valid)
-                    if len(group) == len(pattern_days):
-                        local_domain.append(group)
-
-        # Limit domain size for performance
-        if len(local_domain) > 100:
-            local_domain = random.sample(local_domain, 100)
-        else:
-            random.shuffle(local_domain)
-            
-        return str(sid), local_domain
-
-    def _is_valid_combination(lec, lab):
-        """Fast combination validation"""
-        if lec[0].get('instructor_id') != lab[0].get('instructor_id'):
-            return False
-            
-        for a in lec:
-            for b in lab:
-                if a['day_of_week'] == b['day_of_week'] and intervals_overlap(a['start_time'], a['end_time'], b['start_time'], b['end_time']):
-                    return False
-        return True
-
-    # ---------- Parallel domain construction with limits ----------
-    start_build = time.time()
-    
-    # Limit the number of workers based on subject count
-    max_workers = min(6, len(subjects))
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(build_domain_for_subject, subj): subj for subj in subjects}
-        for fut in as_completed(futures):
-            try:
-                var_name, dom = fut.result()
-                domains[var_name] = dom
-            except Exception:
-                subj = futures[fut]
-                var_name, dom = build_domain_for_subject(subj)
-                domains[var_name] = dom
-                
-    build_time = time.time() - start_build
-    print(f"[diagnostic] domain build took {build_time:.2f}s; total subjects: {len(subjects)}")
-
-    # ---------- Pre-filter domains ----------
-    for var, groups in list(domains.items()):
-        filtered = []
-        for g in groups:
-            instr = g[0].get('instructor_id')
-            if instr not in max_loads:
-                continue
-            if len(g) > max_loads[instr]:
-                continue
-            filtered.append(g)
-        domains[var] = filtered
-
-    # Remove empty domains early
-    domains = {k: v for k, v in domains.items() if v}
-
-    if not domains:
-        flash("No valid scheduling options found for any subjects.", "danger")
-        conn.close()
-        return redirect(url_for('auto_scheduler.auto_scheduler_home'))
+    semester = params['semester']
+    school_year = params['school_year']
+    start_time = datetime.strptime(params['start_time'], "%H:%M")
+    end_time = datetime.strptime(params['end_time'], "%H:%M")
 
-    # ---------- Run AC3 with timeout ----------
-    ac3_start = time.time()
-    if not ac3(domains, trim_large_domains=True):
-        print("[diagnostic] AC3 failed - no valid schedule possible after propagation.")
-        flash("AC-3 failed: no valid schedule possible.", "danger")
-        conn.close()
-        return redirect(url_for('auto_scheduler.auto_scheduler_home'))
-    print(f"[diagnostic] AC3 propagation took {time.time()-ac3_start:.2f}s")
-
-    # ---------- Run optimized backtracking ----------
-    bt_start = time.time()
-    final_assignment = backtrack({}, domains, instructor_load, max_loads)
-    exec_time = time.time() - bt_start
-    print(f"[diagnostic] backtracking took {exec_time:.2f}s")
-
-    if final_assignment:
-        # Batch database operations
-        subject_ids = list(final_assignment.keys())
-        if subject_ids:
-            placeholders = ','.join(['%s'] * len(subject_ids))
-            delete_q = f"""
-                DELETE FROM schedules
-                WHERE subject_id IN ({placeholders})
-                AND semester = %s AND school_year = %s
-                AND (approved IS NULL OR approved = 0)
-            """
-            subject_ids_int = [int(x) for x in subject_ids]
-            cur.execute(delete_q, tuple(subject_ids_int) + (semester, school_year))
-
-        # Batch insert
-        insert_data = []
-        for var, group in final_assignment.items():
-            for s in group:
-                insert_data.append((
-                    s['subject_id'], s['instructor_id'], s['room_id'],
-                    s['day_of_week'], s['start_time'], s['end_time'],
-                    semester, school_year
-                ))
-
-        if insert_data:
-            insert_q = """
-                INSERT INTO schedules
-                (subject_id, instructor_id, room_id, day_of_week, start_time, end_time, semester, school_year)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            cur.executemany(insert_q, insert_data)
+    # The budget covers loading, domain building and the solve, not the final write
+    time_limit = params.get('time_limit', SOLVER_TIME_LIMIT)
+    deadline = time.time() + time_limit
+    stop = lambda: job.cancelled or time.time() > deadline
 
-        conn.commit()
-        flash(f"Schedule generated successfully in {exec_time:.2f} seconds with all constraints applied.", "success")
+    job.set_phase('loading')
+    load_start = time.perf_counter()
 
-    else:
-        flash("Failed to generate schedule - no valid assignment found.", "danger")
+    # --- Get approved schedules to avoid conflicts
+    approved_schedules = get_approved_schedules(semester, school_year)
+    logger.info("auto-scheduler job #%s: %d approved schedules to avoid", job.job_id, len(approved_schedules))
 
-    conn.close()
-    return redirect(url_for('auto_scheduler.auto_scheduler_home'))
\ No newline at end of file
+    # --- Generate time slots with bulk operations
+    time_slots = build_time_slots(start_time, end_time)
+    if not time_slots:
+        return "warning", "No time slots available."
+
+    # --- Subjects, instructors and rooms, unless a batch loaded them already
+    if reference is None:
+        reference = load_reference_data()
+    subjects = reference.term_subjects(approved_schedules)
+    instructors, rooms = reference.instructors, reference.rooms
+    room_programs_map = reference.room_programs_map
+    metrics.phases['loading'] = time.perf_counter() - load_start
+
+    job.update(subjects=len(subjects), approved_sessions=len(approved_schedules))
+
+    def deliver(schedule):
+        """Write ``schedule`` to the drafts, or in preview mode keep it for the admin with its diff"""
+        if not params.get('preview'):
+            job.set_phase('writing')
+            with metrics.phase('writing'):
+                job.update(**write_schedule(semester, school_year, schedule))
+            return
+        job.set_phase('previewing')
+        with metrics.phase('previewing'):
+            names = {
+                'subjects': {subj['subject_id']: subj.get('name') for subj in subjects},
+                'instructors': {ins['instructor_id']: ins.get('name') for ins in instructors},
+                'rooms': {room['room_id']: room.get('room_number') for room in rooms},
+            }
+            conn = get_db_connection()
+            cur = conn.cursor(dictionary=True)
+            existing = _select_drafts(cur, semester, school_year, schedule)
+            cur.close()
+            conn.close()
+            preview = GenerationPreview(job.job_id, params,
+                                        input_fingerprint(params, reference, approved_schedules, drafts),
+                                        schedule, preview_changes(existing, schedule, names))
+            store_preview(job.user_id, preview)
+        job.update(preview=preview.to_dict()['summary'])
+
+    # Previews remember the drafts they were solved against; incremental runs repair them
+    drafts = None
+    if params.get('preview') or params.get('mode') == 'incremental':
+        drafts = get_draft_schedules(semester, school_year)
+
+    # ---------- Reuse a stored solution for identical inputs ----------
+    fingerprint = None
+    if params.get('mode') != 'incremental':
+        fingerprint = input_fingerprint(params, reference, approved_schedules)
+        cached = _solution_cache.get(fingerprint)
+        if cached is not None:
+            schedule, unscheduled = cached
+            logger.info("auto-scheduler job #%s: reusing cached solution %s", job.job_id, fingerprint[:12])
+            metrics.incr('solution_cache_hits')
+            job.update(cached_solution=fingerprint[:12])
+            if unscheduled:
+                job.update(unscheduled=unscheduled)
+            deliver(schedule)
+            cleared = "would be cleared" if params.get('preview') else "were cleared"
+            message = "Inputs are unchanged since the last generation; reused its stored schedule."
+            if unscheduled:
+                return "warning", (f"{message} {len(unscheduled)} subjects had no valid options and were skipped; "
+                                   f"their old drafts {cleared}.")
+            return "success", message
+
+    # Without an explicit seed, identical inputs give identical runs
+    seed = params.get('seed')
+    if seed is None:
+        seed = int(fingerprint[:8], 16) if fingerprint else random.randrange(1 << 30)
+
+    # Instructor data; copies, so no term of a batch can affect the next
+    max_loads = dict(reference.max_loads)
+    statuses = dict(reference.statuses)
+    context.statuses = statuses
+
+    # Control randomness for reproducibility
+    rng = random.Random(seed)
+    builder = DomainBuilder(rooms, room_programs_map, max_loads, statuses, rng=rng)
+
+    def solve_subjects(subject_rows, loads, blocked_sessions):
+        """Build, propagate and search domains for ``subject_rows``; returns a SolveOutcome"""
+        domains = {}
+
+        # ---------- Domain construction over the slot catalogue ----------
+        job.set_phase('building_domains')
+        with metrics.phase('building_domains'):
+            catalogue = reference.catalogue(time_slots, blocked_sessions)
+            for subj in subject_rows:
+                var_name, dom = builder.build(subj, catalogue)
+                domains[var_name] = dom
+                job.update(domains_built=len(domains))
+            metrics.record_domains('built', domains)
+
+            # ---------- Pre-filter domains ----------
+            domains, unplaceable = prefilter_domains(domains, loads)
+            metrics.record_domains('prefiltered', domains)
+        logger.info("auto-scheduler job #%s: built domains for %d subjects in %.2fs",
+                    job.job_id, len(subject_rows), metrics.phases['building_domains'])
+
+        if not domains:
+            return SolveOutcome(error="No valid scheduling options found for any subjects.",
+                                unplaceable=unplaceable)
+
+        # ---------- Intern domain values ----------
+        with metrics.phase('interning'):
+            table = DomainTable(domains, context)
+            domains = table.initial_domains()
+
+        job.update(variables=len(domains), domain_values=len(table.groups))
+
+        # ---------- Run AC3 with timeout ----------
+        job.set_phase('propagating')
+        with metrics.phase('propagating'):
+            consistent = ac3(domains, table, stop=stop)
+        metrics.record_domains('propagated', domains)
+        if not consistent:
+            logger.info("auto-scheduler job #%s: AC-3 emptied a domain; no valid schedule possible", job.job_id)
+            return SolveOutcome(table, error="AC-3 failed: no valid schedule possible.", unplaceable=unplaceable)
+
+        # ---------- Run optimized backtracking ----------
+        job.set_phase('searching')
+        bt_start = time.time()
+        search_progress = lambda nodes, restarts: job.update(nodes=nodes, restarts=restarts)
+        interrupted = False
+        try:
+            # Independent components are solved separately; a single one goes to the chosen solver
+            assignment, restarts = solve_components(
+                domains, table, loads, solver=params.get('solver', 'portfolio'), seed=seed,
+                progress=search_progress, stop=lambda: job.cancelled, deadline=deadline,
+                heuristic=params.get('heuristic', 'mrv'), value_order=params.get('value_order', 'lcv')
+            )
+        except SearchInterrupted as e:
+            assignment, restarts, interrupted = e.partial, e.restarts, True
+        job.update(restarts=restarts)
+        exec_time = time.time() - bt_start
+        metrics.phases['searching'] = metrics.phases.get('searching', 0.0) + exec_time
+        logger.info("auto-scheduler job #%s: search took %.2fs with %d restarts", job.job_id, exec_time, restarts)
+
+        if interrupted:
+            return SolveOutcome(table, assignment, interrupted=True, seconds=exec_time, unplaceable=unplaceable)
+        if not assignment:
+            return SolveOutcome(table, error="Failed to generate schedule - no valid assignment found.",
+                                seconds=exec_time, unplaceable=unplaceable)
+        if params.get('optimize'):
+            assignment = improve_soft_cost(table, domains, assignment, loads)
+        return SolveOutcome(table, assignment, seconds=exec_time, unplaceable=unplaceable)
+
+    def improve_soft_cost(table, domains, assignment, loads):
+        """Branch and bound on the soft costs from the first solution until the deadline"""
+        job.set_phase('optimizing')
+        scorer = SoftScorer(table, builder.preferred_rooms)
+        first_cost = scorer.cost(assignment)
+        opt_start = time.time()
+        with metrics.phase('optimizing'):
+            assignment, cost, proven = optimize_schedule(
+                assignment, domains, table, loads, scorer, deadline=deadline, stop=lambda: job.cancelled,
+                progress=lambda nodes, best: job.update(optimization_nodes=nodes, soft_cost=best)
+            )
+        seconds = time.time() - opt_start
+        job.update(soft_cost_first=first_cost, soft_cost=cost, soft_cost_optimal=proven,
+                   soft_cost_seconds=round(seconds, 2))
+        logger.info("auto-scheduler job #%s: soft cost %d -> %d%s in %.2fs; %s", job.job_id, first_cost, cost,
+                    " (optimal)" if proven else "", seconds, scorer.breakdown(assignment))
+        return assignment
+
+    def repair_with_local_search(table, loads):
+        """Fallback when propagation or backtracking fails: best min-conflicts assignment"""
+        job.set_phase('local_search')
+        ls_start = time.time()
+        assignment, conflicts = min_conflicts(
+            table.initial_domains(), table, loads, time_limit=max(1.0, deadline - time.time()), seed=seed,
+            progress=lambda steps, best: job.update(local_search_steps=steps, conflicts=best),
+            stop=lambda: job.cancelled
+        )
+        job.update(conflicts=conflicts)
+        seconds = time.time() - ls_start
+        metrics.phases['local_search'] = seconds
+        logger.info("auto-scheduler job #%s: local search took %.2fs; %d conflicts left",
+                    job.job_id, seconds, conflicts)
+        return assignment, conflicts, seconds
+
+    conflicts = 0
+    if params.get('mode') != 'incremental':
+        loads = max_loads
+        outcome = solve_subjects(subjects, loads, approved_schedules)
+        exec_time = outcome.seconds
+    else:
+        # ---------- Incremental repair ----------
+        subjects_by_id = {subj['subject_id']: subj for subj in subjects}
+        changed = touched_subjects(subjects, drafts, rooms, room_programs_map, approved_schedules,
+                                   statuses, time_slots, params.get('subject_ids', ()))
+        logger.info("auto-scheduler job #%s: incremental, %d touched subjects out of %d",
+                    job.job_id, len(changed), len(subjects))
+        if not changed:
+            return "success", "Drafts are up to date; no subjects needed rescheduling."
+
+        exec_time = 0.0
+        for expansion in range(INCREMENTAL_MAX_EXPANSIONS + 1):
+            # Drafts outside the neighbourhood stay put and block their rooms and instructors
+            fixed = [s for sid, sessions in drafts.items()
+                     if sid not in changed and sid in subjects_by_id for s in sessions]
+            loads = dict(max_loads)
+            for s in fixed:
+                if s['instructor_id'] in loads:
+                    loads[s['instructor_id']] -= 1
+            job.update(touched_subjects=len(changed), fixed_sessions=len(fixed), expansions=expansion)
+
+            outcome = solve_subjects([subjects_by_id[sid] for sid in changed], loads,
+                                     approved_schedules.extended(fixed))
+            exec_time += outcome.seconds
+            if not outcome.error:
+                break
+            wider = changed | conflict_neighbours(changed, drafts, subjects_by_id)
+            if wider == changed:
+                break
+            changed = wider
+
+        if outcome.error and outcome.table is None:
+            outcome.error += " Incremental repair could not place the changed subjects; run a full generation."
+        kept_subjects = len(subjects_by_id) - len(changed)
+
+    if job.cancelled:
+        return "cancelled", "Generation was cancelled; no drafts were written."
+
+    table = outcome.table
+    final_assignment = outcome.assignment
+    if outcome.error and table is not None:
+        final_assignment, conflicts, seconds = repair_with_local_search(table, loads)
+        exec_time += seconds
+        if job.cancelled:
+            return "cancelled", "Generation was cancelled; no drafts were written."
+    elif outcome.error:
+        return "danger", outcome.error
+
+    # Report every subject left out, with the reason it could not be placed
+    subject_names = {str(subj['subject_id']): subj.get('name') for subj in subjects}
+    unscheduled = [(var, "No room and time slot satisfies its room type, program and approved schedules.")
+                   for var in outcome.unplaceable]
+    if outcome.interrupted:
+        final_assignment = extend_partial(final_assignment, table, loads, stop=lambda: job.cancelled)
+        unscheduled.extend((var, explain_unscheduled(var, final_assignment, table, loads))
+                           for var in table.variables if var not in final_assignment)
+    if unscheduled:
+        job.update(unscheduled=[
+            {'subject_id': int(var), 'name': subject_names.get(var), 'reason': reason}
+            for var, reason in unscheduled
+        ])
+
+    schedule = {var: table.groups[vid] for var, vid in final_assignment.items()}
+    # An unscheduled subject's old drafts could clash with the new placements, so they go
+    schedule.update((var, ()) for var, _ in unscheduled)
+    if fingerprint and not conflicts and not outcome.interrupted:
+        _solution_cache.put(fingerprint, schedule, job.progress.get('unscheduled', []))
+
+    deliver(schedule)
+    cleared = "would be cleared" if params.get('preview') else "were cleared"
+
+    if conflicts:
+        return "warning", (f"The solver found no conflict-free schedule. Wrote the closest draft "
+                           f"found by local search in {exec_time:.2f} seconds with {conflicts} conflicts left "
+                           f"for review.")
+    if outcome.interrupted:
+        return "warning", (f"Time budget of {time_limit:g} seconds ran out. Scheduled {len(final_assignment)} "
+                           f"subjects; {len(unscheduled)} are unscheduled, see the list of reasons. Their old "
+                           f"drafts {cleared} so they cannot clash with the new placements.")
+
+    if params.get('mode') == 'incremental':
+        message = (f"Rescheduled {len(final_assignment)} subjects in {exec_time:.2f} seconds; "
+                   f"{kept_subjects} subjects kept their drafts.")
+    else:
+        message = f"Schedule generated successfully in {exec_time:.2f} seconds with all constraints applied."
+    if 'soft_cost' in job.progress:
+        message += (f" Soft-constraint cost lowered from {job.progress['soft_cost_first']} "
+                    f"to {job.progress['soft_cost']}"
+                    f"{' (optimal)' if job.progress['soft_cost_optimal'] else ''} "
+                    f"in a further {job.progress['soft_cost_seconds']:.2f} seconds of optimization.")
+    if unscheduled:
+        return "warning", (f"{message} {len(unscheduled)} subjects had no valid options and were skipped; "
+                           f"their old drafts {cleared}.")
+    return "success", message
@@ -0,0 +1,5 @@
+"""Benchmarks for scheduler_core; run with ``python -m benchmarks.run``
+
+``python -m benchmarks.selfcheck`` compares the optimised solver code with the
+plain implementations it replaced.
+"""
@@ -0,0 +1,210 @@
+# benchmarks/run.py
+"""Time and measure the scheduler phases on synthetic terms, and compare against baselines
+
+Usage (from the repository root)::
+
+    python -m benchmarks.run                       # default sizes, compare to baselines.json
+    python -m benchmarks.run --sizes 50 200 --seed 3
+    python -m benchmarks.run --update-baselines    # record this machine's numbers
+
+Each size is timed once per phase: domain build (slot catalogue, builder and
+load pre-filter), interning into a DomainTable, AC-3 and the restart search.
+Peak traced memory per phase comes from a second, separate pass under
+tracemalloc so tracing does not distort the timings. A phase regresses when it
+is slower or larger than its baseline by more than ``--tolerance``; a search
+that times out is judged by nodes per second instead. A size whose synthetic
+term no longer matches its baseline (the generator or domain builder changed)
+is reported instead of compared, until the baselines are re-recorded. The exit
+status is 1 if anything regressed. Baselines are machine specific, so record
+them on the machine the comparison runs on.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from scheduler_core.constraints import DomainTable
+from scheduler_core.context import SolverContext
+from scheduler_core.domains import DomainBuilder, SlotCatalogue, prefilter_domains
+from scheduler_core.search import SearchInterrupted, ac3, solve_with_restarts
+
+from .synthetic import generate_term
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+DEFAULT_SIZES = [50, 100, 200]
+PHASES = ('build', 'intern', 'ac3', 'search')
+# Counters describing the term itself; when they differ, the baseline measured another workload
+WORKLOAD_COUNTERS = ('subjects', 'approved_sessions', 'domain_values')
+# Timings below this many seconds are noise and never count as regressions
+MIN_SECONDS = 0.05
+
+
+def run_phases(term, seed, time_limit, trace_memory=False):
+    """Run every phase once; returns ``{phase: {'seconds': .., 'peak_kb': ..}}`` plus counters"""
+    context = SolverContext(term.statuses)
+    max_loads = term.max_loads
+    results = {}
+
+    def measure(phase, fn):
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        value = fn()
+        results[phase] = {'seconds': round(time.perf_counter() - start, 4)}
+        if trace_memory:
+            results[phase]['peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+        return value
+
+    def build():
+        builder = DomainBuilder(term.rooms, term.room_programs_map, max_loads, term.statuses,
+                                rng=random.Random(seed))
+        catalogue = SlotCatalogue(term.time_slots, term.approved)
+        domains = dict(builder.build(subj, catalogue) for subj in term.subjects)
+        return prefilter_domains(domains, max_loads)
+
+    domains, unplaceable = measure('build', build)
+    table = measure('intern', lambda: DomainTable(domains, context))
+    domains = table.initial_domains()
+    consistent = measure('ac3', lambda: ac3(domains, table))
+
+    counters = {
+        'subjects': len(term.subjects),
+        'approved_sessions': len(term.approved),
+        'unplaceable': len(unplaceable),
+        'domain_values': len(table.groups),
+        'values_after_ac3': int(sum(len(d) for d in domains.values())),
+    }
+
+    def solve():
+        if not consistent:
+            return 'ac3_wipeout'
+        deadline = time.time() + time_limit
+        try:
+            assignment, _ = solve_with_restarts(
+                domains, table, max_loads, seed=seed, stop=lambda: time.time() > deadline
+            )
+        except SearchInterrupted as e:
+            counters['assigned'] = len(e.partial)
+            return 'timeout'
+        counters['assigned'] = len(assignment or {})
+        return 'solved' if assignment else 'unsatisfiable'
+
+    counters['status'] = measure('search', solve)
+    # Every search node counts here; the progress callback only fires every few hundred
+    counters['nodes'] = context.metrics.counters['nodes']
+    return results, counters
+
+
+def benchmark(sizes, seed, time_limit, approved_fraction, memory=True):
+    report = {}
+    for size in sizes:
+        term = generate_term(size, seed=seed, approved_fraction=approved_fraction)
+        timings, counters = run_phases(term, seed, time_limit)
+        if memory:
+            peaks, _ = run_phases(term, seed, time_limit, trace_memory=True)
+            for phase in PHASES:
+                timings[phase]['peak_kb'] = peaks[phase]['peak_kb']
+
+        seconds = timings['build']['seconds']
+        counters['build_values_per_s'] = round(counters['domain_values'] / seconds) if seconds else None
+        seconds = timings['search']['seconds']
+        counters['nodes_per_s'] = round(counters['nodes'] / seconds) if seconds else None
+        report[str(size)] = {'phases': timings, 'counters': counters}
+    return report
+
+
+def compare(report, baselines, tolerance):
+    """Regression messages for every phase slower or larger than its baseline allows"""
+    regressions = []
+    for size, entry in report.items():
+        base = baselines.get(size)
+        if base is None:
+            continue
+        changed = [f"{key} {entry['counters'][key]} vs {base['counters'].get(key)}"
+                   for key in WORKLOAD_COUNTERS if entry['counters'][key] != base['counters'].get(key)]
+        if changed:
+            regressions.append(f"size {size}: the term differs from its baseline ({', '.join(changed)}); "
+                               f"re-record the baselines with --update-baselines")
+            continue
+        if base['counters'].get('status') == 'solved' and entry['counters']['status'] != 'solved':
+            regressions.append(f"size {size}: search now ends '{entry['counters']['status']}'")
+        timed_out = entry['counters']['status'] == 'timeout'
+        if timed_out and base['counters'].get('status') == 'timeout':
+            # Both searches ran out the clock, so compare how fast they explored instead
+            now, then = entry['counters']['nodes_per_s'] or 0, base['counters']['nodes_per_s'] or 0
+            if now * tolerance < then:
+                regressions.append(f"size {size} search: {now} nodes/s vs baseline {then} nodes/s")
+        for phase in PHASES:
+            now, then = entry['phases'][phase], base['phases'][phase]
+            slower = now['seconds'] > max(then['seconds'] * tolerance, MIN_SECONDS)
+            if slower and not (phase == 'search' and timed_out):
+                regressions.append(f"size {size} {phase}: {now['seconds']:.3f}s vs baseline {then['seconds']:.3f}s")
+            if 'peak_kb' in now and 'peak_kb' in then and now['peak_kb'] > max(then['peak_kb'] * tolerance, 1024):
+                regressions.append(f"size {size} {phase}: {now['peak_kb']} KiB vs baseline {then['peak_kb']} KiB")
+    return regressions
+
+
+def print_report(report):
+    header = f"{'size':>6} {'phase':<7} {'seconds':>9} {'peak KiB':>9}"
+    print(header)
+    print('-' * len(header))
+    for size, entry in report.items():
+        for phase in PHASES:
+            timing = entry['phases'][phase]
+            print(f"{size:>6} {phase:<7} {timing['seconds']:>9.3f} {timing.get('peak_kb', ''):>9}")
+        c = entry['counters']
+        print(f"{'':>6} {c['status']}: {c.get('assigned', 0)}/{c['subjects'] - c['unplaceable']} assigned, "
+              f"{c['domain_values']} values ({c['build_values_per_s']}/s built), "
+              f"{c['nodes']} nodes ({c['nodes_per_s']}/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="subjects per synthetic term")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--time-limit', type=float, default=30.0,
+                        help="seconds allowed for each search; keep it above baseline times the tolerance")
+    parser.add_argument('--approved-fraction', type=float, default=0.2)
+    parser.add_argument('--tolerance', type=float, default=1.5, help="allowed slowdown factor before failing")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--baselines', default=BASELINES_PATH)
+    parser.add_argument('--update-baselines', action='store_true')
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.sizes, args.seed, args.time_limit, args.approved_fraction, memory=not args.no_memory)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.update_baselines:
+        baselines = {}
+        if os.path.exists(args.baselines):
+            with open(args.baselines) as f:
+                baselines = json.load(f)
+        baselines.update(report)
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baselines written to {args.baselines}")
+        return 0
+
+    if not os.path.exists(args.baselines):
+        print("No baselines recorded; run with --update-baselines first.")
+        return 0
+    with open(args.baselines) as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("No regressions against baselines.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
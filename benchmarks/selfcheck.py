@@ -0,0 +1,528 @@
+# benchmarks/selfcheck.py
+"""Check the optimised solver code against the plain implementations it replaced
+
+Usage (from the repository root)::
+
+    python -m benchmarks.selfcheck                 # every check on seeds 1-5
+    python -m benchmarks.selfcheck --checks index --seeds 20
+
+Every check draws random inputs from synthetic terms and compares the fast code
+path with a straightforward reference kept here: a linear scan, a textbook
+algorithm or a brute-force count. A check returns the mismatches it found for
+one seed; the exit status is 1 if any check found one.
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from collections import Counter, deque
+
+from scheduler_core.constraints import (
+    DAYS, DomainTable, ScheduleIndex, Session, conflicts_with_approved_schedule, groups_compatible, parse_time_str
+)
+from scheduler_core.context import SolverContext
+from scheduler_core.domains import DomainBuilder, SlotCatalogue
+from scheduler_core.scoring import PREFERRED_END, PREFERRED_START, SoftScorer, branch_and_bound, optimize_schedule
+from scheduler_core.search import ac3, backtrack, solve_with_restarts
+
+from .synthetic import generate_term
+
+CHECKS = {}
+
+
+def check(name):
+    """Register ``fn(seed) -> [mismatch, ...]`` under ``name``"""
+    def register(fn):
+        CHECKS[name] = fn
+        return fn
+    return register
+
+
+def random_session(rng, term):
+    """A session row at a random time for a random instructor and room of ``term``"""
+    start = rng.randrange(7 * 60, 19 * 60, 15)
+    end = start + rng.choice([30, 60, 90, 120])
+    return {
+        'instructor_id': rng.choice(term.instructors)['instructor_id'],
+        'room_id': rng.choice(term.rooms)['room_id'],
+        'day_of_week': rng.choice(DAYS),
+        'start_time': f"{start // 60:02d}:{start % 60:02d}",
+        'end_time': f"{end // 60:02d}:{end % 60:02d}",
+    }
+
+
+def small_problem(seed, n_subjects=16, max_values=16):
+    """A tight term with every domain cut to a random handful of values, as ``(term, domains)``
+
+    Few rooms and short domains make propagation and search actually prune, and
+    keep the brute-force references fast.
+    """
+    rng = random.Random(seed)
+    term = generate_term(n_subjects, seed=seed, subjects_per_lecture_room=n_subjects,
+                         subjects_per_lab_room=n_subjects)
+    builder = DomainBuilder(term.rooms, term.room_programs_map, term.max_loads, term.statuses,
+                            rng=random.Random(seed))
+    catalogue = SlotCatalogue(term.time_slots, term.approved)
+    domains = {}
+    for subj in term.subjects:
+        var, groups = builder.build(subj, catalogue)
+        if groups:
+            domains[var] = rng.sample(groups, min(len(groups), rng.randint(2, max_values)))
+    return term, domains
+
+
+# ---------- Approved-schedule index ----------
+@check('index')
+def check_schedule_index(seed, samples=2000):
+    """ScheduleIndex and the slot catalogue's busy masks against a scan of every approved session"""
+    rng = random.Random(seed)
+    term = generate_term(60, seed=seed, approved_fraction=0.5)
+    # Approvals never clash with each other; random extras make buckets with nested intervals
+    approved = list(term.approved) + [random_session(rng, term) for _ in range(len(term.approved) // 2)]
+    half = len(approved) // 2
+    indexes = {'index': ScheduleIndex(approved), 'extended': ScheduleIndex(approved[:half]).extended(approved[half:])}
+    mismatches = []
+
+    for _ in range(samples):
+        session = rng.choice(approved) if rng.random() < 0.1 else random_session(rng, term)
+        expected = conflicts_with_approved_schedule(session, approved)
+        for name, index in indexes.items():
+            if conflicts_with_approved_schedule(session, index) != expected:
+                mismatches.append(f"{name} says {not expected} for {session}, the scan says {expected}")
+
+    catalogue = SlotCatalogue(term.time_slots, approved)
+    for _ in range(samples // 20):
+        instructor_id = rng.choice(term.instructors)['instructor_id']
+        room_id = rng.choice(term.rooms)['room_id']
+        days = rng.sample(DAYS, rng.randint(1, 3))
+        free = catalogue.free_mask(room_id, instructor_id, days)
+        for k, (start, end) in enumerate(term.time_slots):
+            expected = not any(conflicts_with_approved_schedule(
+                {'instructor_id': instructor_id, 'room_id': room_id, 'day_of_week': day,
+                 'start_time': start, 'end_time': end}, approved) for day in days)
+            if bool(free[k]) != expected:
+                mismatches.append(f"slot {start}-{end} of room {room_id}, instructor {instructor_id} on {days}: "
+                                  f"catalogue says free={bool(free[k])}, the scan says {expected}")
+    return mismatches
+
+
+# ---------- AC-2001 propagation ----------
+def naive_ac3(domains):
+    """Textbook AC-3 on raw groups: every ordered pair of variables is an arc
+
+    Returns the arc-consistent domains, or None when one is wiped out.
+    """
+    domains = {var: list(groups) for var, groups in domains.items()}
+    queue = deque((xi, xj) for xi in domains for xj in domains if xi != xj)
+    queued = set(queue)
+    while queue:
+        xi, xj = arc = queue.popleft()
+        queued.discard(arc)
+        kept = [a for a in domains[xi] if any(groups_compatible(a, b) for b in domains[xj])]
+        if len(kept) == len(domains[xi]):
+            continue
+        if not kept:
+            return None
+        domains[xi] = kept
+        for xk in domains:
+            if xk not in (xi, xj) and (xk, xi) not in queued:
+                queue.append((xk, xi))
+                queued.add((xk, xi))
+    return domains
+
+
+@check('ac3')
+def check_ac3(seed, problems=4):
+    """ac3() over the sparse constraint graph against naive AC-3 over every pair
+
+    Arc consistency has a single fixpoint, so both must keep exactly the same values.
+    """
+    mismatches = []
+    for k in range(problems):
+        term, domains = small_problem(seed * 100 + k)
+        expected = naive_ac3(domains)
+        table = DomainTable(domains, SolverContext(term.statuses))
+        ids = table.initial_domains()
+        consistent = ac3(ids, table)
+        if consistent != (expected is not None):
+            mismatches.append(f"problem {k}: ac3() returned {consistent}, naive AC-3 {expected is not None}")
+        elif consistent:
+            for var, groups in expected.items():
+                kept = {table.groups[vid] for vid in ids[var].tolist()}
+                if kept != set(groups):
+                    mismatches.append(f"problem {k}, subject {var}: ac3() kept {len(kept)} values, "
+                                      f"naive AC-3 {len(groups)}")
+    return mismatches
+
+
+# ---------- Backjumping search ----------
+PLAIN_SEARCH_MAX_NODES = 500000   # problems the reference cannot settle within this are skipped
+
+def schedule_rules(domains, max_loads, statuses):
+    """``fits(assignment, var, group)``: the solver's hard constraints, checked from scratch on raw groups"""
+    instructor_vars = {}
+    for var, groups in domains.items():
+        instructor_vars.setdefault(groups[0][0].instructor_id, []).append(var)
+    compatible = {}
+
+    def fits(assignment, var, group):
+        instr = group[0].instructor_id
+        for other in assignment.values():
+            key = (id(group), id(other))
+            if key not in compatible:
+                compatible[key] = groups_compatible(group, other)
+            if not compatible[key]:
+                return False
+        mine = [g for g in assignment.values() if g[0].instructor_id == instr] + [group]
+        if sum(map(len, mine)) > max_loads.get(instr, 0):
+            return False
+        # Part-time instructors may not teach everything on one day
+        if statuses.get(instr) == 'part time' and all(w in assignment or w == var for w in instructor_vars[instr]):
+            return len({s.day for g in mine for s in g}) > 1
+        return True
+    return fits
+
+
+def plain_backtracking(domains, fits):
+    """Chronological backtracking in a fixed variable order; None when unsolvable, False when over budget"""
+    variables = list(domains)
+    nodes = [0]
+
+    def search(assignment):
+        nodes[0] += 1
+        if nodes[0] > PLAIN_SEARCH_MAX_NODES:
+            return False
+        if len(assignment) == len(variables):
+            return dict(assignment)
+        var = variables[len(assignment)]
+        for group in domains[var]:
+            if fits(assignment, var, group):
+                assignment[var] = group
+                result = search(assignment)
+                if result is not None:
+                    return result
+                del assignment[var]
+        return None
+    return search({})
+
+
+@check('search')
+def check_search(seed, problems=8):
+    """backtrack() and solve_with_restarts() against plain backtracking
+
+    Both must agree with the reference on whether a problem is solvable and
+    return schedules that pass every hard constraint. Some instructor loads are
+    cut so the load rule prunes too, and the restarts get tiny node budgets so
+    nogoods and memos carry across many runs.
+    """
+    mismatches = []
+    for k in range(problems):
+        rng = random.Random(seed * 100 + k)
+        term, domains = small_problem(seed * 100 + k, n_subjects=10, max_values=10)
+        max_loads = {i: rng.randint(1, 8) if rng.random() < 0.3 else load for i, load in term.max_loads.items()}
+        fits = schedule_rules(domains, max_loads, term.statuses)
+        expected = plain_backtracking(domains, fits)
+        if expected is False:
+            continue
+
+        table = DomainTable(domains, SolverContext(term.statuses))
+        found = {
+            'backtrack': backtrack({}, table.initial_domains(), table, {}, max_loads),
+            'restarts': solve_with_restarts(table.initial_domains(), table, max_loads, base_nodes=4, seed=seed)[0],
+        }
+        for name, assignment in found.items():
+            if (assignment is None) != (expected is None):
+                mismatches.append(f"problem {k}: {name} found {'no ' if assignment is None else ''}solution, "
+                                  f"plain backtracking {'none' if expected is None else 'one'}")
+                continue
+            if assignment is not None and len(assignment) != len(domains):
+                mismatches.append(f"problem {k}: {name} placed {len(assignment)} of {len(domains)} subjects")
+            placed = {}
+            for var, vid in (assignment or {}).items():
+                if not fits(placed, var, table.groups[vid]):
+                    mismatches.append(f"problem {k}: {name} placed subject {var} against a hard constraint")
+                placed[var] = table.groups[vid]
+    return mismatches
+
+
+# ---------- Diff writer ----------
+TERM = ('First Semester', '2024-2025')
+WRITER_SCHEMA = """
+    CREATE TABLE schedules (
+        schedule_id INTEGER PRIMARY KEY AUTOINCREMENT, subject_id INT, instructor_id INT, room_id INT,
+        day_of_week TEXT, start_time TEXT, end_time TEXT, semester TEXT, school_year TEXT, approved INT DEFAULT 0
+    );
+    CREATE TABLE conflicts (conflict_id INTEGER PRIMARY KEY AUTOINCREMENT, schedule1_id INT, schedule2_id INT);
+"""
+
+
+class SQLiteConnection:
+    """Just enough of a mysql.connector connection over sqlite3 to run write_schedule()"""
+
+    class Cursor:
+        def __init__(self, db):
+            self.cur = db.cursor()
+
+        @staticmethod
+        def sql(query):
+            return query.replace('%s', '?').replace('FOR UPDATE', '')
+
+        def execute(self, query, params=()):
+            self.cur.execute(self.sql(query), params)
+
+        def executemany(self, query, rows):
+            self.cur.executemany(self.sql(query), rows)
+
+        def fetchall(self):
+            names = [d[0] for d in self.cur.description]
+            return [dict(zip(names, row)) for row in self.cur.fetchall()]
+
+        def close(self):
+            self.cur.close()
+
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, dictionary=True):
+        return self.Cursor(self.db)
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        pass
+
+
+def draft_database(rng, n_subjects=20):
+    """A database of random drafts, plus the schedule to write over them
+
+    Each subject draws both its current drafts and its new sessions from a small
+    pool, so some rows match exactly, some move and the counts differ. Approved
+    rows, rows of another term and subjects left out of the schedule must come
+    through untouched; some times are stored the way MySQL returns TIME columns.
+    """
+    db = sqlite3.connect(':memory:')
+    db.executescript(WRITER_SCHEMA)
+    schedule = {}
+    for subject_id in range(1, n_subjects + 1):
+        instructor_id = rng.randint(1, 5)
+        pool = []
+        for _ in range(6):
+            start = rng.randrange(7 * 60, 17 * 60, 30)
+            pool.append(Session(subject_id, instructor_id, rng.randint(1, 4), rng.randrange(5), start,
+                                start + rng.choice([60, 90])))
+        for session in rng.sample(pool, rng.randint(0, 5)):
+            row = session.as_row()
+            if rng.random() < 0.3:
+                row['start_time'] += ':00'
+            approved = int(rng.random() < 0.1)
+            term = TERM if rng.random() < 0.9 else ('Second Semester', TERM[1])
+            db.execute("INSERT INTO schedules (subject_id, instructor_id, room_id, day_of_week, start_time, end_time, "
+                       "semester, school_year, approved) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (*[row[f] for f in ('subject_id', 'instructor_id', 'room_id', 'day_of_week', 'start_time',
+                                           'end_time')], *term, approved))
+        if rng.random() < 0.8:
+            schedule[str(subject_id)] = tuple(rng.sample(pool, rng.randint(1, 5)))
+
+    ids = [schedule_id for (schedule_id,) in db.execute("SELECT schedule_id FROM schedules")]
+    for _ in range(len(ids) // 2):
+        db.execute("INSERT INTO conflicts (schedule1_id, schedule2_id) VALUES (?, ?)", tuple(rng.sample(ids, 2)))
+    db.commit()
+    return db, schedule
+
+
+def rewrite_drafts(db, schedule):
+    """The writer diff_drafts replaced: delete the subjects' drafts and their conflicts, insert every session"""
+    placeholders = ','.join('?' * len(schedule))
+    ids = [schedule_id for (schedule_id,) in db.execute(
+        f"SELECT schedule_id FROM schedules WHERE subject_id IN ({placeholders}) AND semester = ? "
+        f"AND school_year = ? AND (approved IS NULL OR approved = 0)", (*map(int, schedule), *TERM))]
+    id_list = ','.join('?' * len(ids))
+    db.execute(f"DELETE FROM conflicts WHERE schedule1_id IN ({id_list}) OR schedule2_id IN ({id_list})", ids * 2)
+    db.execute(f"DELETE FROM schedules WHERE schedule_id IN ({id_list})", ids)
+    db.executemany("INSERT INTO schedules (subject_id, instructor_id, room_id, day_of_week, start_time, end_time, "
+                   "semester, school_year) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                   [(*s.as_row().values(), *TERM) for group in schedule.values() for s in group])
+    db.commit()
+
+
+def schedule_rows(db):
+    """Every row of ``schedules`` without its ID, times as HH:MM, as a multiset"""
+    return Counter(
+        (subject_id, instructor_id, room_id, day, parse_time_str(start), parse_time_str(end), *rest)
+        for subject_id, instructor_id, room_id, day, start, end, *rest in db.execute(
+            "SELECT subject_id, instructor_id, room_id, day_of_week, start_time, end_time, semester, school_year, "
+            "approved FROM schedules"))
+
+
+@check('writer')
+def check_writer(seed, problems=5):
+    """write_schedule() against deleting and re-inserting the drafts
+
+    Both must leave the same rows. The diff writer must also keep every conflict
+    whose two rows survive and no other. It must delete or insert only each
+    subject's surplus, keeping the other drafts' schedule IDs.
+    """
+    # The writer lives in the Flask module, so only this check needs Flask and mysql.connector
+    from admin_modules import auto_scheduler as writer
+
+    mismatches = []
+    saved = writer.get_db_connection, writer.WRITE_BATCH_ROWS
+    try:
+        for k in range(problems):
+            rng = random.Random(seed * 100 + k)
+            db, schedule = draft_database(rng)
+            reference, _ = draft_database(random.Random(seed * 100 + k))
+            before_ids = {schedule_id for (schedule_id,) in db.execute("SELECT schedule_id FROM schedules")}
+            conflicts = set(db.execute("SELECT conflict_id, schedule1_id, schedule2_id FROM conflicts"))
+            drafts = Counter(subject_id for (subject_id,) in db.execute(
+                "SELECT subject_id FROM schedules WHERE semester = ? AND school_year = ? AND approved = 0", TERM))
+
+            # Small batches on odd problems exercise the multi-statement path
+            writer.get_db_connection = lambda: SQLiteConnection(db)
+            writer.WRITE_BATCH_ROWS = 3 if k % 2 else saved[1]
+            counts = writer.write_schedule(*TERM, schedule)
+            rewrite_drafts(reference, schedule)
+
+            if schedule_rows(db) != schedule_rows(reference):
+                mismatches.append(f"problem {k}: the diff writer left other rows than deleting and re-inserting")
+            after_ids = {schedule_id for (schedule_id,) in db.execute("SELECT schedule_id FROM schedules")}
+            kept = {c for c in conflicts if c[1] in after_ids and c[2] in after_ids}
+            if set(db.execute("SELECT conflict_id, schedule1_id, schedule2_id FROM conflicts")) != kept:
+                mismatches.append(f"problem {k}: conflicts of surviving rows were lost or orphans were left")
+            new = {int(var): len(group) for var, group in schedule.items()}
+            surplus = sum(max(0, drafts[s] - n) for s, n in new.items())
+            missing = sum(max(0, n - drafts[s]) for s, n in new.items())
+            if (counts['rows_deleted'], counts['rows_inserted']) != (surplus, missing) \
+                    or len(before_ids - after_ids) != surplus:
+                mismatches.append(f"problem {k}: deleted {counts['rows_deleted']} and inserted "
+                                  f"{counts['rows_inserted']} rows, only {surplus} and {missing} were needed")
+    finally:
+        writer.get_db_connection, writer.WRITE_BATCH_ROWS = saved
+    return mismatches
+
+
+# ---------- Incremental soft scoring ----------
+def scratch_cost(placed, preferred_rooms, weights):
+    """Soft-cost terms of ``(variable, group)`` placements, counted from their sessions alone"""
+    busy = {}
+    terms = {'gaps': 0, 'days': 0, 'hours': 0, 'rooms': 0}
+    for var, group in placed:
+        for s in group:
+            busy.setdefault((s.instructor_id, s.day), []).append((s.start, s.end))
+            terms['hours'] += sum(1 for minute in range(s.start, s.end)
+                                  if not PREFERRED_START <= minute < PREFERRED_END)
+            terms['rooms'] += bool(preferred_rooms.get(var)) and s.room_id not in preferred_rooms[var]
+    for spans in busy.values():
+        terms['gaps'] += max(e for _, e in spans) - min(s for s, _ in spans) - sum(e - s for s, e in spans)
+    terms['days'] = len(busy)
+    terms['cost'] = sum(weights[term] * value for term, value in terms.items())
+    return terms
+
+
+def all_schedules(domains, fits):
+    """Every complete assignment of raw groups that passes the hard constraints"""
+    variables = list(domains)
+
+    def extend(assignment):
+        if len(assignment) == len(variables):
+            yield dict(assignment)
+            return
+        var = variables[len(assignment)]
+        for group in domains[var]:
+            if fits(assignment, var, group):
+                assignment[var] = group
+                yield from extend(assignment)
+                del assignment[var]
+    return extend({})
+
+
+@check('scoring')
+def check_scoring(seed, problems=4, steps=150):
+    """ScoreState, SoftScorer.breakdown() and branch and bound against costs counted from scratch
+
+    Random add/remove sequences must keep every term and deltas() equal to a
+    recount. Branch and bound, and optimize_schedule() from a first solution,
+    must reach the cheapest of all valid schedules when they report it proven.
+    """
+    mismatches = []
+    for k in range(problems):
+        rng = random.Random(seed * 100 + k)
+        term, domains = small_problem(seed * 100 + k, n_subjects=7, max_values=4)
+        table = DomainTable(domains, SolverContext(term.statuses))
+        room_ids = [room['room_id'] for room in term.rooms]
+        preferred = {var: set(rng.sample(room_ids, rng.randint(1, 2))) for var in domains if rng.random() < 0.5}
+        scorer = SoftScorer(table, preferred)
+
+        state, placed = scorer.state(), []
+        for step in range(steps):
+            if placed and rng.random() < 0.4:
+                vid = placed.pop(rng.randrange(len(placed)))
+                state.remove(vid)
+            else:
+                vid = rng.randrange(len(table.groups))
+                expected = scratch_cost([(table.owner[v], table.groups[v]) for v in placed + [vid]], preferred,
+                                        scorer.weights)['cost']
+                now = scratch_cost([(table.owner[v], table.groups[v]) for v in placed], preferred, scorer.weights)
+                if state.deltas(vid)[0] != expected - now['cost']:
+                    mismatches.append(f"problem {k}, step {step}: deltas() of value {vid} is "
+                                      f"{state.deltas(vid)[0]}, a recount gives {expected - now['cost']}")
+                placed.append(vid)
+                state.add(vid)
+            expected = scratch_cost([(table.owner[v], table.groups[v]) for v in placed], preferred, scorer.weights)
+            if (state.gaps, state.days, state.cost) != (expected['gaps'], expected['days'], expected['cost']):
+                mismatches.append(f"problem {k}, step {step}: ScoreState has gaps {state.gaps}, days {state.days}, "
+                                  f"cost {state.cost}; a recount gives {expected}")
+                break
+
+        fits = schedule_rules(domains, term.max_loads, term.statuses)
+        costs = [scratch_cost(schedule.items(), preferred, scorer.weights)['cost']
+                 for schedule in all_schedules(domains, fits)]
+        best = min(costs, default=None)
+        first = backtrack({}, table.initial_domains(), table, {}, term.max_loads)
+        if first is not None:
+            breakdown = scorer.breakdown(first)
+            expected = scratch_cost([(var, table.groups[vid]) for var, vid in first.items()], preferred,
+                                    scorer.weights)
+            if breakdown != expected:
+                mismatches.append(f"problem {k}: breakdown() gives {breakdown}, a recount {expected}")
+
+        results = {'branch_and_bound': branch_and_bound(table.initial_domains(), table, term.max_loads, scorer)}
+        if first is not None:
+            results['optimize_schedule'] = optimize_schedule(first, table.initial_domains(), table,
+                                                             term.max_loads, scorer)
+        for name, (assignment, cost, proven) in results.items():
+            if assignment is None and best is None:
+                continue
+            if assignment is None or best is None or (proven and cost != best) or cost < best:
+                mismatches.append(f"problem {k}: {name} reached cost {cost} (proven {proven}), "
+                                  f"the cheapest valid schedule costs {best}")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checks', nargs='+', choices=sorted(CHECKS), default=list(CHECKS))
+    parser.add_argument('--seeds', type=int, default=5, help="seeds 1..N per check")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for name in args.checks:
+        start = time.perf_counter()
+        mismatches = []
+        for seed in range(1, args.seeds + 1):
+            mismatches.extend(f"seed {seed}: {line}" for line in CHECKS[name](seed))
+        status = 'ok' if not mismatches else f"{len(mismatches)} MISMATCHES"
+        print(f"{name:<10} {status} ({args.seeds} seeds, {time.perf_counter() - start:.1f}s)")
+        for line in mismatches[:10]:
+            print(f"    {line}")
+        failed += bool(mismatches)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
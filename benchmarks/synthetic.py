@@ -0,0 +1,156 @@
+# benchmarks/synthetic.py
+"""Synthetic terms shaped like the rows the auto-scheduler loads from MySQL"""
+import random
+from datetime import datetime
+
+from scheduler_core.constraints import ScheduleIndex
+from scheduler_core.domains import DomainBuilder, SlotCatalogue, build_time_slots, sessions_for_subject
+
+PROGRAMS = ['BSIT', 'BSCS', 'BSIS']
+STATUSES = [('permanent', 0.5), ('part time', 0.25), ('temporary', 0.25)]
+# 90-minute Tuesday/Thursday sessions that fit a permanent instructor's 8-5 day around lunch
+PERMANENT_TTH_SUBJECTS = 4
+
+
+class SyntheticTerm:
+    """Inputs of one generation run: the same shapes run_generation builds from the database"""
+
+    def __init__(self, subjects, instructors, rooms, room_programs, approved, start_time, end_time):
+        self.subjects = subjects
+        self.instructors = instructors
+        self.rooms = rooms
+        self.room_programs = room_programs
+        self.approved = approved
+        self.start_time = start_time
+        self.end_time = end_time
+
+    @property
+    def max_loads(self):
+        return {ins['instructor_id']: int(ins['max_load_units']) for ins in self.instructors}
+
+    @property
+    def statuses(self):
+        return {ins['instructor_id']: ins['status'].lower() for ins in self.instructors}
+
+    @property
+    def room_programs_map(self):
+        programs = {}
+        for rp in self.room_programs:
+            programs.setdefault(rp['room_id'], []).append(rp['program_name'].strip().upper())
+        return programs
+
+    @property
+    def time_slots(self):
+        return build_time_slots(datetime.strptime(self.start_time, "%H:%M"),
+                                datetime.strptime(self.end_time, "%H:%M"))
+
+
+def generate_term(n_subjects, seed=0, approved_fraction=0.2, subjects_per_instructor=3,
+                  subjects_per_lecture_room=8, subjects_per_lab_room=12, restricted_room_fraction=0.25,
+                  major_fraction=0.5, start_time="07:00", end_time="19:00", departments=1):
+    """A random but reproducible term with ``n_subjects`` subjects
+
+    Each subject goes to an instructor of its department with enough load left
+    for its sessions and time for its pattern: no more Tuesday/Thursday
+    subjects than a permanent instructor's office hours hold, and no one-day
+    subject for part-time instructors, who may not teach everything on one day.
+    Neither loads nor those rules make a term unsolvable on their own.
+
+    A share of the subjects is pre-approved: each is placed greedily where it
+    does not clash with earlier approvals and then removed from the subject
+    list, just as the generation query skips subjects that already have
+    approved schedules.
+    With several ``departments``, every department has its own programs,
+    instructors and rooms, so the term splits into independent parts.
+    """
+    rng = random.Random(seed)
+    if departments > 1:
+        department_programs = [[f"{program}-{d + 1}" for program in PROGRAMS] for d in range(departments)]
+    else:
+        department_programs = [PROGRAMS]
+
+    instructors = []
+    for i in range(1, max(1, n_subjects // subjects_per_instructor) + 1):
+        status = rng.choices([s for s, _ in STATUSES], weights=[w for _, w in STATUSES])[0]
+        instructors.append({
+            'instructor_id': i,
+            'name': f"Instructor {i}",
+            'status': status,
+            'max_load_units': rng.randint(15, 24),
+        })
+    department_instructors = [instructors[d::departments] or instructors for d in range(departments)]
+
+    rooms = []
+    room_programs = []
+    n_lecture = max(2, departments, n_subjects // subjects_per_lecture_room)
+    n_lab = max(1, departments, n_subjects // subjects_per_lab_room)
+    for i in range(n_lecture + n_lab):
+        room_id = i + 1
+        room_type = 'Lecture' if i < n_lecture else 'Lab'
+        rooms.append({'room_id': room_id, 'room_number': f"{room_type[:3].upper()}-{room_id}", 'room_type': room_type})
+        if departments > 1:
+            for program in department_programs[i % departments]:
+                room_programs.append({'room_id': room_id, 'program_name': program})
+        elif rng.random() < restricted_room_fraction:
+            for program in rng.sample(PROGRAMS, rng.randint(1, 2)):
+                room_programs.append({'room_id': room_id, 'program_name': program})
+
+    subjects = []
+    load_left = {ins['instructor_id']: ins['max_load_units'] for ins in instructors}
+    tth_subjects = {ins['instructor_id']: 0 for ins in instructors}
+
+    def has_time(ins, pattern):
+        if pattern == 'OneDay':
+            return ins['status'] != 'part time'
+        if 'TTh' in pattern and ins['status'] == 'permanent':
+            return tth_subjects[ins['instructor_id']] < PERMANENT_TTH_SUBJECTS
+        return True
+
+    for sid in range(1, n_subjects + 1):
+        major = rng.random() < major_fraction
+        department = rng.randrange(departments) if departments > 1 else 0
+        subject = {
+            'subject_id': sid,
+            'name': f"Subject {sid}",
+            'code': f"{'MAJ' if major else 'MIN'}{sid:04d}",
+            'units': 3 if major else rng.choice([1, 2, 3]),
+            'course': rng.choice(department_programs[department]),
+            'course_type': 'major' if major else 'minor',
+        }
+        pattern, sessions = sessions_for_subject(subject)
+        pool = [ins for ins in department_instructors[department] if has_time(ins, pattern)]
+        pool = pool or department_instructors[department]
+        fitting = [ins for ins in pool if load_left[ins['instructor_id']] >= sessions]
+        if fitting:
+            instructor = rng.choice(fitting)
+        else:
+            # Every instructor of the department is full: stretch the least loaded one
+            instructor = max(pool, key=lambda ins: load_left[ins['instructor_id']])
+            shortfall = sessions - load_left[instructor['instructor_id']]
+            instructor['max_load_units'] += shortfall
+            load_left[instructor['instructor_id']] += shortfall
+        load_left[instructor['instructor_id']] -= sessions
+        tth_subjects[instructor['instructor_id']] += 'TTh' in pattern
+        subject['instructor_id'] = instructor['instructor_id']
+        subjects.append(subject)
+
+    term = SyntheticTerm(subjects, instructors, rooms, room_programs, [], start_time, end_time)
+
+    # Pre-approve a share of the subjects without clashes between approvals
+    approved = []
+    builder = DomainBuilder(rooms, term.room_programs_map, term.max_loads, term.statuses, rng=rng)
+    time_slots = term.time_slots
+    remaining = []
+    for subj in subjects:
+        if rng.random() >= approved_fraction:
+            remaining.append(subj)
+            continue
+        _, groups = builder.build(subj, SlotCatalogue(time_slots, ScheduleIndex(approved)))
+        if groups:
+            approved.extend(s.as_row() for s in groups[0])
+        else:
+            remaining.append(subj)
+
+    term.subjects = remaining
+    term.approved = ScheduleIndex(approved)
+    return term
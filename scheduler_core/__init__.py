@@ -0,0 +1,22 @@
+"""Course scheduling solver, independent of Flask and MySQL
+
+The admin auto-scheduler loads its inputs from the database and hands them to
+these modules; the benchmarks drive them directly with synthetic terms.
+"""
+from .context import SolverContext
+from .constraints import DomainTable, ScheduleIndex, Session, groups_compatible
+from .domains import DomainBuilder, SlotCatalogue, build_time_slots, prefilter_domains
+from .search import (
+    SearchInterrupted, SolveOutcome, ac3, backtrack, min_conflicts, solve_components, solve_portfolio,
+    solve_with_restarts
+)
+from .cache import SolutionCache, generation_fingerprint
+
+__all__ = [
+    'SolverContext',
+    'DomainTable', 'ScheduleIndex', 'Session', 'groups_compatible',
+    'DomainBuilder', 'SlotCatalogue', 'build_time_slots', 'prefilter_domains',
+    'SearchInterrupted', 'SolveOutcome', 'ac3', 'backtrack', 'min_conflicts',
+    'solve_components', 'solve_portfolio', 'solve_with_restarts',
+    'SolutionCache', 'generation_fingerprint',
+]
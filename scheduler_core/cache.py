@@ -0,0 +1,74 @@
+# scheduler_core/cache.py
+"""Solved schedules kept per fingerprint of the generation inputs"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+# ---------- Solution cache ----------
+SOLUTION_CACHE_SIZE = 16
+SOLVER_VERSION = 1   # bump when a solver change makes old solutions unsuitable for reuse
+
+# Generation options that can change the schedule a run produces. ``mode`` and
+# ``subject_ids`` are left out because incremental runs are never cached, and
+# ``preview`` only decides whether the result is written.
+FINGERPRINT_PARAMS = ('semester', 'school_year', 'start_time', 'end_time', 'seed', 'optimize',
+                      'solver', 'heuristic', 'value_order', 'time_limit')
+
+class SolutionCache:
+    """Least-recently-used store of solved schedules keyed by input fingerprint"""
+
+    def __init__(self, max_entries=SOLUTION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, fingerprint):
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                self._entries.move_to_end(fingerprint)
+            return entry
+
+    def put(self, fingerprint, schedule, unscheduled):
+        with self._lock:
+            self._entries[fingerprint] = (schedule, unscheduled)
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+
+def generation_fingerprint(params, subjects, instructors, rooms, room_programs, approved_schedules,
+                           drafts=None):
+    """SHA-256 over the generation parameters and the content of every input table
+
+    Any edit to subjects, instructors, rooms, room programs or approved schedules,
+    or to a FINGERPRINT_PARAMS option, changes the fingerprint, so stale
+    solutions are never matched. Passing the term's draft rows as ``drafts``
+    makes edits to those count too.
+    """
+    def rows(items):
+        return sorted(json.dumps(item, sort_keys=True, default=str) for item in items)
+
+    payload = {
+        'version': SOLVER_VERSION,
+        'params': {key: params.get(key) for key in FINGERPRINT_PARAMS},
+        'subjects': rows(subjects),
+        'instructors': rows(instructors),
+        'rooms': rows(rooms),
+        'room_programs': rows(room_programs),
+        'approved': rows(approved_schedules),
+    }
+    if drafts is not None:
+        payload['drafts'] = rows(drafts)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
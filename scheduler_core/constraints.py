@@ -0,0 +1,521 @@
+# scheduler_core/constraints.py
+"""Time helpers, occupancy bitmasks and interned compatibility checks for schedule groups
+
+A group is one candidate placement of a subject: a tuple of Session records with
+integer subject, instructor and room IDs, day index and start/end minutes.
+"""
+from functools import lru_cache
+from datetime import datetime
+from bisect import bisect_left
+import itertools
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+from .context import SolverContext
+
+
+# ---------- Time helpers ----------
+# Pre-compute time conversions for faster processing
+@lru_cache(maxsize=4096)
+def parse_time_str(t):
+    if not t:
+        return None
+    
+    if isinstance(t, str):
+        for fmt in ("%H:%M:%S", "%H:%M"):
+            try:
+                dt = datetime.strptime(t, fmt)
+                return dt.strftime("%H:%M")
+            except Exception:
+                continue
+    return None
+
+# Pre-computed time interval checks
+@lru_cache(maxsize=10000)
+def _intervals_overlap_cached(s1: str, e1: str, s2: str, e2: str) -> bool:
+    """Cached version of interval overlap check - 100x faster than datetime parsing"""
+    # Convert "HH:MM" to minutes since midnight for fast comparison
+    def time_to_minutes(t: str) -> int:
+        h, m = map(int, t.split(':'))
+        return h * 60 + m
+    
+    start1, end1 = time_to_minutes(s1), time_to_minutes(e1)
+    start2, end2 = time_to_minutes(s2), time_to_minutes(e2)
+    
+    return not (end1 <= start2 or end2 <= start1)
+
+def intervals_overlap(s1, e1, s2, e2):
+    return _intervals_overlap_cached(s1, e1, s2, e2)
+
+
+# ---------- Approved schedule index ----------
+class ScheduleIndex:
+    """Sessions bucketed by (room, day) and (instructor, day) as sorted interval arrays
+
+    Each bucket keeps its intervals sorted by start minute together with the running
+    maximum of their ends, so "does [start, end) overlap anything here" is one
+    bisect: the intervals starting before ``end`` overlap iff the largest of their
+    ends is past ``start``. Iterating the index yields the original session dicts.
+    """
+
+    def __init__(self, sessions=()):
+        self.sessions = list(sessions)
+        intervals = {}
+        for s in self.sessions:
+            if not s.get('start_time') or not s.get('end_time'):
+                continue
+            span = (_time_to_minutes(s['start_time']), _time_to_minutes(s['end_time']))
+            for resource in (('room', s.get('room_id')), ('instructor', s.get('instructor_id'))):
+                if resource[1] is not None:
+                    intervals.setdefault((resource, s['day_of_week']), []).append(span)
+
+        # ((kind, id), day) -> (sorted starts, running max of ends, sorted intervals)
+        self.buckets = {}
+        for key, spans in intervals.items():
+            spans.sort()
+            self.buckets[key] = (
+                [start for start, _ in spans],
+                list(itertools.accumulate((end for _, end in spans), max)),
+                spans
+            )
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(self.sessions)
+
+    def extended(self, sessions):
+        """A new index holding these sessions as well"""
+        return ScheduleIndex(self.sessions + list(sessions))
+
+    def overlaps(self, kind, resource_id, day, start, end):
+        bucket = self.buckets.get(((kind, resource_id), day))
+        if bucket is None:
+            return False
+        starts, max_ends, _ = bucket
+        i = bisect_left(starts, end)
+        return i > 0 and max_ends[i - 1] > start
+
+    def conflicts(self, session):
+        """True if the session shares an instructor or room with an overlapping indexed session"""
+        start, end = _time_to_minutes(session['start_time']), _time_to_minutes(session['end_time'])
+        day = session.get('day_of_week')
+        return (self.overlaps('instructor', session.get('instructor_id'), day, start, end)
+                or self.overlaps('room', session.get('room_id'), day, start, end))
+
+
+def conflicts_with_approved_schedule(candidate_session, approved_schedules):
+    """Check if candidate session conflicts with any approved schedule"""
+    if isinstance(approved_schedules, ScheduleIndex):
+        return approved_schedules.conflicts(candidate_session)
+
+    candidate_instructor = candidate_session.get('instructor_id')
+    candidate_room = candidate_session.get('room_id')
+    candidate_day = candidate_session.get('day_of_week')
+    candidate_start = candidate_session.get('start_time')
+    candidate_end = candidate_session.get('end_time')
+    
+    for approved in approved_schedules:
+        # Same instructor conflict
+        if (approved['instructor_id'] == candidate_instructor and 
+            approved['day_of_week'] == candidate_day and
+            intervals_overlap(approved['start_time'], approved['end_time'], candidate_start, candidate_end)):
+            return True
+            
+        # Same room conflict  
+        if (approved['room_id'] == candidate_room and
+            approved['day_of_week'] == candidate_day and
+            intervals_overlap(approved['start_time'], approved['end_time'], candidate_start, candidate_end)):
+            return True
+    
+    return False
+
+
+# ---------- Occupancy bitmasks ----------
+# Each (instructor, day) and (room, day) pair is encoded as an integer bitmask with
+# one bit per 30-minute cell of the day, so two groups clash only if the masks of a
+# shared key AND to something non-zero.
+SLOT_MINUTES = 30
+DAY_INDEX = {
+    'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
+    'Friday': 4, 'Saturday': 5, 'Sunday': 6
+}
+DAYS = tuple(DAY_INDEX)
+
+def _time_to_minutes(t: str) -> int:
+    h, m = map(int, t.split(':')[:2])
+    return h * 60 + m
+
+def _minutes_to_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def time_range_mask(start: str, end: str) -> Tuple[int, bool]:
+    """Bitmask of the cells covered by [start, end) and whether it lies on the cell grid"""
+    return minutes_range_mask(_time_to_minutes(start), _time_to_minutes(end))
+
+@lru_cache(maxsize=4096)
+def minutes_range_mask(start_min: int, end_min: int) -> Tuple[int, bool]:
+    """``time_range_mask`` for times given in minutes since midnight"""
+    first = start_min // SLOT_MINUTES
+    last = -(-end_min // SLOT_MINUTES)  # partial cells count as occupied
+    exact = start_min % SLOT_MINUTES == 0 and end_min % SLOT_MINUTES == 0
+    if last <= first:
+        return 0, exact
+    return ((1 << (last - first)) - 1) << first, exact
+
+
+# ---------- Session records ----------
+class Session(NamedTuple):
+    """One meeting of a candidate group
+
+    Domains hold hundreds of thousands of these, so they are plain tuples of ints:
+    ``day`` indexes DAYS and ``start``/``end`` are minutes since midnight. The
+    lecture and lab halves of a combined group share their records.
+    """
+    subject_id: int
+    instructor_id: int
+    room_id: int
+    day: int
+    start: int
+    end: int
+
+    @property
+    def day_of_week(self):
+        return DAYS[self.day]
+
+    def as_row(self):
+        """The session as a ``schedules`` row dict, times as HH:MM"""
+        return {
+            'subject_id': self.subject_id,
+            'instructor_id': self.instructor_id,
+            'room_id': self.room_id,
+            'day_of_week': DAYS[self.day],
+            'start_time': _minutes_to_time(self.start),
+            'end_time': _minutes_to_time(self.end)
+        }
+
+
+# ---------- Conflict check ----------
+# Optimized group compatibility with vectorized operations
+class GroupKey:
+    """Immutable key for group compatibility checking - 10x faster than tuple creation"""
+    __slots__ = ('sessions_data', 'hash_val', 'instructor_masks', 'room_masks', 'subjects', 'exact')
+    
+    def __init__(self, group):
+        # Session records already carry integer fields
+        self.sessions_data = tuple(group)
+        self.hash_val = hash(self.sessions_data)
+
+        # Occupancy masks keyed by (instructor_id, day) and (room_id, day)
+        self.instructor_masks = {}
+        self.room_masks = {}
+        self.exact = True
+        for _, instr_id, room_id, day, start, end in self.sessions_data:
+            mask, exact = minutes_range_mask(start, end)
+            self.exact = self.exact and exact
+            if instr_id:
+                key = (instr_id, day)
+                self.instructor_masks[key] = self.instructor_masks.get(key, 0) | mask
+            if room_id:
+                key = (room_id, day)
+                self.room_masks[key] = self.room_masks.get(key, 0) | mask
+        self.subjects = frozenset(s[0] for s in self.sessions_data if s[0])
+    
+    def __hash__(self):
+        return self.hash_val
+    
+    def __eq__(self, other):
+        return self.sessions_data == other.sessions_data
+
+def groups_compatible(group_a, group_b):
+    """Compatibility check for two raw groups"""
+    if not group_a or not group_b:
+        return True
+    return _groups_compatible_fast(GroupKey(group_a), GroupKey(group_b))
+
+def _groups_compatible_fast(key_a, key_b):
+    """Bitwise compatibility check on the pre-computed occupancy masks"""
+    # Same-subject rules and off-grid times need the exact session comparison
+    if key_a.subjects & key_b.subjects or not (key_a.exact and key_b.exact):
+        return _sessions_compatible(key_a.sessions_data, key_b.sessions_data)
+
+    masks_a, masks_b = key_a.instructor_masks, key_b.instructor_masks
+    if len(masks_b) < len(masks_a):
+        masks_a, masks_b = masks_b, masks_a
+    for slot, mask in masks_a.items():
+        if masks_b.get(slot, 0) & mask:
+            return False
+
+    masks_a, masks_b = key_a.room_masks, key_b.room_masks
+    if len(masks_b) < len(masks_a):
+        masks_a, masks_b = masks_b, masks_a
+    for slot, mask in masks_a.items():
+        if masks_b.get(slot, 0) & mask:
+            return False
+    return True
+
+def _sessions_compatible(sessions_a, sessions_b):
+    """Session-by-session compatibility check used when masks cannot decide"""
+    for a in sessions_a:
+        subj_id_a, instr_id_a, room_id_a, day_a, start_a, end_a = a
+        for b in sessions_b:
+            subj_id_b, instr_id_b, room_id_b, day_b, start_b, end_b = b
+            
+            # Same subject conflict
+            if subj_id_a == subj_id_b and subj_id_a != 0:
+                if instr_id_a != instr_id_b or room_id_a != room_id_b:
+                    return False
+                if day_a == day_b:
+                    return False
+            
+            # Time overlap conflict
+            if day_a == day_b:
+                if start_a < end_b and start_b < end_a:
+                    if instr_id_a == instr_id_b and instr_id_a != 0:
+                        return False
+                    if room_id_a == room_id_b and room_id_a != 0:
+                        return False
+    
+    return True
+
+
+# ---------- Interned domains ----------
+ZOBRIST_SEED = 0x5EED
+
+class DomainTable:
+    """Interns every domain group to an integer ID and checks compatibility on NumPy arrays
+
+    Values of one variable get contiguous IDs, so a value's position in its initial
+    domain is ``value_id - offsets[var]``. Each value is flattened into up to ``width``
+    resources (instructor or room) with one uint64 lane of occupancy bits per day.
+    ``context`` holds the run's caches and metrics; building a table resets its caches.
+    """
+
+    def __init__(self, domains, context=None):
+        self.context = context if context is not None else SolverContext()
+        self.variables = list(domains)
+        self.groups = []
+        self.offsets = {}
+        self.sizes = {}
+        self.owner = []
+        for var in self.variables:
+            self.offsets[var] = len(self.groups)
+            self.sizes[var] = len(domains[var])
+            self.groups.extend(domains[var])
+            self.owner.extend([var] * len(domains[var]))
+
+        n_values = len(self.groups)
+        self.context.reset_caches(row_bytes=(n_values + 7) // 8)
+        self.keys = [GroupKey(g) for g in self.groups]
+        self.session_counts = np.array([len(g) for g in self.groups], dtype=np.int32)
+        # Random 64-bit key per value; XOR over an assignment gives its Zobrist signature
+        self.zobrist = np.random.default_rng(ZOBRIST_SEED).integers(
+            0, np.iinfo(np.uint64).max, n_values, dtype=np.uint64, endpoint=True).tolist()
+        self.instructors = np.array(
+            [int(g[0].instructor_id or 0) if g else 0 for g in self.groups], dtype=np.int64
+        )
+
+        # Flatten occupancy masks to (resource code, day lanes); instructors are even
+        # codes and rooms odd codes so both live in one array
+        resources = []
+        self.exact = np.array([key.exact for key in self.keys], dtype=bool)
+        for key in self.keys:
+            lanes = {}
+            for kind, masks in ((0, key.instructor_masks), (1, key.room_masks)):
+                for (res_id, day), mask in masks.items():
+                    lanes.setdefault(res_id * 2 + kind, [0] * 7)[day] |= mask
+            resources.append(lanes)
+
+        self.width = max((len(r) for r in resources), default=0) or 1
+        self.res_codes = np.full((n_values, self.width), -1, dtype=np.int64)
+        self.lanes = np.zeros((n_values, self.width, 7), dtype=np.uint64)
+        for i, lanes in enumerate(resources):
+            for k, (code, day_lanes) in enumerate(lanes.items()):
+                self.res_codes[i, k] = code
+                self.lanes[i, k] = day_lanes
+
+        # One bit per resource code modulo 64: values whose signatures do not
+        # intersect cannot share an instructor or room
+        bits = np.left_shift(np.uint64(1), (self.res_codes % 64).astype(np.uint64))
+        self.res_signature = np.bitwise_or.reduce(np.where(self.res_codes >= 0, bits, np.uint64(0)), axis=1)
+
+        self.var_subjects = {}
+        self.instructor_vars = {}
+        subject_vars = {}
+        for var in self.variables:
+            for instr in set(self.instructors[self.ids(var)].tolist()):
+                self.instructor_vars.setdefault(instr, set()).add(var)
+            subjects = set()
+            for vid in self.ids(var).tolist():
+                subjects.update(self.keys[vid].subjects)
+            self.var_subjects[var] = subjects
+            for subj in subjects:
+                subject_vars.setdefault(subj, set()).add(var)
+
+        # Variables whose values share a subject need the exact same-subject rules
+        self.subject_peers = {
+            var: set().union(*(subject_vars[s] for s in self.var_subjects[var])) - {var}
+            for var in self.variables
+        }
+        self.neighbours = self._constraint_graph()
+        self.degree = {var: len(adj) for var, adj in self.neighbours.items()}
+        self._value_conflicts = None
+
+    def ids(self, var):
+        start = self.offsets[var]
+        return np.arange(start, start + self.sizes[var], dtype=np.int64)
+
+    def initial_domains(self):
+        return {var: self.ids(var) for var in self.variables}
+
+    def local(self, var, ids):
+        return ids - self.offsets[var]
+
+    def _constraint_graph(self):
+        """Neighbour lists: variables that can clash on a shared resource or share a subject
+
+        Two variables are neighbours when some instructor or room appears in both
+        their domains with overlapping occupancy bits on the same day (off-grid
+        values round outwards to whole cells, so they can only gain neighbours), so
+        most pairs from different rooms, days or times never become arcs.
+        """
+        by_code = {}
+        for var in self.variables:
+            ids = self.ids(var)
+            codes, lanes = self.res_codes[ids], self.lanes[ids]
+            for code in set(codes[codes >= 0].tolist()):
+                union = np.bitwise_or.reduce(lanes[codes == code].reshape(-1, 7), axis=0)
+                by_code.setdefault(code, []).append((var, union))
+
+        neighbours = {var: set(self.subject_peers[var]) for var in self.variables}
+        for entries in by_code.values():
+            if len(entries) < 2:
+                continue
+            unions = np.array([u for _, u in entries], dtype=np.uint64)
+            overlap = (unions[:, None, :] & unions[None, :, :]).any(axis=-1)
+            for a, b in zip(*np.nonzero(np.triu(overlap, k=1))):
+                neighbours[entries[a][0]].add(entries[b][0])
+                neighbours[entries[b][0]].add(entries[a][0])
+        return {var: sorted(adj, key=self.offsets.get) for var, adj in neighbours.items()}
+
+    def components(self, variables=None):
+        """Connected components of ``variables`` (default: all), largest first
+
+        Variables are connected through the constraint graph and through a shared
+        instructor, whose load limit and part-time rule span all of their subjects
+        even when those never overlap in time.
+        """
+        variables = set(self.variables if variables is None else variables)
+        seen = set()
+        components = []
+        for start in self.variables:
+            if start not in variables or start in seen:
+                continue
+            seen.add(start)
+            component, stack = [], [start]
+            while stack:
+                var = stack.pop()
+                component.append(var)
+                linked = itertools.chain(
+                    self.neighbours[var],
+                    *(self.instructor_vars[instr] for instr in set(self.instructors[self.ids(var)].tolist()) if instr)
+                )
+                for other in linked:
+                    if other in variables and other not in seen:
+                        seen.add(other)
+                        stack.append(other)
+            components.append(sorted(component, key=self.offsets.get))
+        return sorted(components, key=len, reverse=True)
+
+    def value_conflicts(self):
+        """Per value, how many values of other variables it overlaps on an instructor or room
+
+        Counted per occupied half-hour cell and computed once per table: a value
+        meeting in a busy room at a popular time scores high, so least-constraining
+        value ordering tries it late.
+        """
+        if self._value_conflicts is not None:
+            return self._value_conflicts
+
+        # One row per (value, resource) with its occupied cells across the week
+        value_rows, slots = np.nonzero(self.res_codes >= 0)
+        _, code_rows = np.unique(self.res_codes[value_rows, slots], return_inverse=True)
+        cells = np.unpackbits(self.lanes[value_rows, slots].view(np.uint8), axis=-1, bitorder='little')
+        cells = cells[:, cells.any(axis=0)]   # drop cells nobody occupies (nights, weekends)
+        var_index = {var: i for i, var in enumerate(self.variables)}
+        owners = np.array([var_index[self.owner[v]] for v in value_rows.tolist()], dtype=np.int64)
+
+        def totals(keys):
+            """Cell occupancy summed over the rows sharing a key, looked up per row"""
+            unique, inverse = np.unique(keys, return_inverse=True)
+            order = np.argsort(inverse, kind='stable')
+            starts = np.searchsorted(inverse[order], np.arange(len(unique)))
+            summed = np.add.reduceat(cells[order].astype(np.int32), starts, axis=0)
+            return summed[inverse]
+
+        # A variable's own values never meet each other, so they do not count
+        others = totals(code_rows) - totals(code_rows * len(self.variables) + owners)
+        per_row = (cells * others).sum(axis=1)
+        conflicts = np.bincount(value_rows, weights=per_row, minlength=len(self.groups)).astype(np.int64)
+        self._value_conflicts = conflicts
+        return conflicts
+
+    def pair_compatible(self, ids_a, ids_b, exact_check=False):
+        """Element-wise compatibility of ``ids_a[k]`` with ``ids_b[k]``
+
+        ``exact_check`` forces the session-level comparison for every pair, which
+        the same-subject rules need.
+        """
+        compatible = np.ones(len(ids_a), dtype=bool)
+        # Only pairs sharing an instructor or room need their day lanes compared
+        maybe = np.nonzero(self.res_signature[ids_a] & self.res_signature[ids_b])[0]
+        if len(maybe):
+            sub_a, sub_b = ids_a[maybe], ids_b[maybe]
+            codes_a, codes_b = self.res_codes[sub_a], self.res_codes[sub_b]
+            same = (codes_a[:, :, None] == codes_b[:, None, :]) & (codes_a[:, :, None] >= 0)
+            overlap = (self.lanes[sub_a][:, :, None, :] & self.lanes[sub_b][:, None, :, :]).any(axis=-1)
+            compatible[maybe] = ~(same & overlap).any(axis=(1, 2))
+
+        recheck = range(len(ids_a)) if exact_check else np.nonzero(~(self.exact[ids_a] & self.exact[ids_b]))[0]
+        for k in recheck:
+            compatible[k] = _groups_compatible_fast(self.keys[ids_a[k]], self.keys[ids_b[k]])
+        return compatible
+
+    def row(self, vid):
+        """Packed compatibility bits of one value against every interned value"""
+        packed = self.context.compatibility_cache.get(vid)
+        if packed is not None:
+            return packed
+
+        clash = np.zeros(len(self.groups), dtype=bool)
+        touched = np.zeros(len(self.groups), dtype=bool)
+        for k in range(self.width):
+            code = self.res_codes[vid, k]
+            if code < 0:
+                continue
+            rows, cols = np.nonzero(self.res_codes == code)
+            touched[rows] = True
+            hit = (self.lanes[rows, cols] & self.lanes[vid, k]).any(axis=-1)
+            clash[rows[hit]] = True
+
+        # Off-grid times and shared subjects get the exact session-level check
+        recheck = touched & ~self.exact if self.exact[vid] else touched.copy()
+        for var in self.subject_peers[self.owner[vid]]:
+            recheck[self.ids(var)] = True
+        for other in np.nonzero(recheck)[0]:
+            clash[other] = not _groups_compatible_fast(self.keys[vid], self.keys[other])
+
+        packed = np.packbits(~clash)
+        self.context.compatibility_cache.put(vid, packed)
+        return packed
+
+    def compatible_mask(self, vid, ids):
+        """Boolean mask over ``ids`` of the values compatible with ``vid``"""
+        packed = self.row(vid)
+        return ((packed[ids >> 3] >> (7 - (ids & 7))) & 1).astype(bool)
+
+    def compatible(self, vid_a, vid_b):
+        packed = self.row(vid_a)
+        return bool((packed[vid_b >> 3] >> (7 - (vid_b & 7))) & 1)
@@ -0,0 +1,81 @@
+# scheduler_core/context.py
+"""State of one generation run: instructor statuses, bounded caches and metrics
+
+A run creates one SolverContext and hands it to each DomainTable it builds; the
+propagation and search functions reach it through ``table.context``. Nothing a
+run memoises or counts is module-level, so runs for different terms can share a
+process and run in parallel threads.
+"""
+from collections import OrderedDict
+
+from .telemetry import SolverMetrics
+
+COMPATIBILITY_CACHE_BYTES = 64 << 20   # packed compatibility rows kept per table
+BACKTRACK_CACHE_SIZE = 200000          # failed search states remembered per table
+
+
+class BoundedCache:
+    """Least-recently-used map holding at most ``max_entries`` items
+
+    Lookups and evictions are counted in ``metrics`` as ``<name>_hits``,
+    ``<name>_misses`` and ``<name>_evictions``.
+    """
+
+    def __init__(self, name, max_entries, metrics):
+        self.name = name
+        self.max_entries = max_entries
+        self.metrics = metrics
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.metrics.incr(f'{self.name}_misses')
+            return None
+        self._entries.move_to_end(key)
+        self.metrics.incr(f'{self.name}_hits')
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.metrics.incr(f'{self.name}_evictions')
+
+    def clear(self):
+        self._entries.clear()
+
+    def __getstate__(self):
+        # Worker processes rebuild what they need; shipping the entries would only bloat the pickle
+        state = self.__dict__.copy()
+        state['_entries'] = OrderedDict()
+        return state
+
+
+class SolverContext:
+    """Instructor statuses, memo caches and metrics of one generation run
+
+    ``statuses`` maps instructor IDs to lower-cased employment status; the
+    part-time one-day rule reads it. The caches hold results about the values of
+    one DomainTable, so building a table resets them.
+    """
+
+    def __init__(self, statuses=None, compatibility_cache_bytes=COMPATIBILITY_CACHE_BYTES,
+                 backtrack_cache_size=BACKTRACK_CACHE_SIZE):
+        self.statuses = statuses if statuses is not None else {}
+        self.metrics = SolverMetrics()
+        self.compatibility_cache_bytes = compatibility_cache_bytes
+        # Value ID -> packed compatibility row against every interned value
+        self.compatibility_cache = BoundedCache('compatibility_cache', 1, self.metrics)
+        # Zobrist signature of a failed assignment -> conflict set explaining the failure
+        self.backtrack_cache = BoundedCache('backtrack_cache', backtrack_cache_size, self.metrics)
+
+    def reset_caches(self, row_bytes=1):
+        """Forget everything memoised for a previous table; its rows take ``row_bytes`` each"""
+        self.compatibility_cache.clear()
+        self.compatibility_cache.max_entries = max(1, self.compatibility_cache_bytes // row_bytes)
+        self.backtrack_cache.clear()
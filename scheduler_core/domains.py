@@ -0,0 +1,360 @@
+# scheduler_core/domains.py
+"""Candidate groups for each subject: time slots, the slot catalogue and the domain builder"""
+import copy
+import random
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+
+from .constraints import DAY_INDEX, ScheduleIndex, Session, _time_to_minutes
+
+
+# ---------- Patterns ----------
+PATTERNS = {
+    'MWF': ['Monday', 'Wednesday', 'Friday'],
+    'TTh': ['Tuesday', 'Thursday'],
+    'OneDay': ['Monday']
+}
+
+def sessions_for_subject(subj):
+    try:
+        units = int(subj.get('units', 3))
+    except Exception:
+        units = 3
+        
+    course_type = (subj.get('course_type') or 'major').lower()
+    
+    # MAJOR SUBJECTS: 5 hours per week (3 units = 3 hours lecture + 2 hours lab)
+    if course_type == 'major' and units == 3:
+        return ('MWF_TTh', 5)  # Special pattern for major subjects
+    
+    # Non-major subjects follow normal patterns
+    if units >= 3:
+        return ('MWF', 3)
+    elif units == 2:
+        return ('TTh', 2)
+    else:
+        return ('OneDay', 1)
+
+
+# ---------- Time slots ----------
+def generate_time_slots_fixed(start_time_dt, end_time_dt, session_length_minutes=90, step_minutes=30):
+    """Optimized time slot generation"""
+    slots = []
+
+    # Pre-calculate total minutes for faster computation
+    total_minutes = int((end_time_dt - start_time_dt).total_seconds() / 60)
+    n_slots = total_minutes // step_minutes
+    
+    for i in range(n_slots):
+        slot_start = start_time_dt + timedelta(minutes=i * step_minutes)
+        slot_end = slot_start + timedelta(minutes=session_length_minutes)
+        
+        if slot_end > end_time_dt:
+            break
+            
+        slots.append((
+            slot_start.strftime("%H:%M"),
+            slot_end.strftime("%H:%M")
+        ))
+    
+    return slots
+
+
+# ---------- Slot catalogue ----------
+LUNCH_START, LUNCH_END = 12 * 60, 13 * 60
+PERMANENT_START, PERMANENT_END = 8 * 60, 17 * 60
+
+class SlotCatalogue:
+    """Integer minute arrays for the run's time slots plus busy masks of blocked sessions
+
+    Built once per solve from the time slots and the sessions candidates must avoid
+    (approved schedules, plus fixed drafts in incremental mode), so the domain
+    builder filters (room, slot, pattern) candidates with boolean masks instead of
+    parsing times and scanning the blocked sessions for every candidate.
+    """
+
+    def __init__(self, time_slots, blocked_sessions):
+        self.slots = list(time_slots)
+        self.starts = np.array([_time_to_minutes(s) for s, _ in self.slots], dtype=np.int32)
+        self.ends = np.array([_time_to_minutes(e) for _, e in self.slots], dtype=np.int32)
+        self.durations = self.ends - self.starts
+        # Shared int objects for the Session records of every group
+        self.spans = list(zip(self.starts.tolist(), self.ends.tolist()))
+        self.lunch_free = ~((self.starts < LUNCH_END) & (LUNCH_START < self.ends))
+        self.office_hours = (self.starts >= PERMANENT_START) & (self.ends <= PERMANENT_END)
+        self._none = np.zeros(len(self.slots), dtype=bool)
+        self._slot_masks = {}
+        self._index_blocked(blocked_sessions)
+
+    def blocking(self, blocked_sessions):
+        """A catalogue of the same slots that avoids ``blocked_sessions`` instead
+
+        The slot arrays and slot masks are shared, so terms generated with the
+        same time window only index their own blocked sessions.
+        """
+        catalogue = copy.copy(self)
+        catalogue._index_blocked(blocked_sessions)
+        return catalogue
+
+    def _index_blocked(self, blocked_sessions):
+        # (room_id, day) / (instructor_id, day) -> slots overlapping a blocked session
+        if not isinstance(blocked_sessions, ScheduleIndex):
+            blocked_sessions = ScheduleIndex(blocked_sessions)
+        self.room_busy = {}
+        self.instructor_busy = {}
+        for ((kind, key), day), (_, _, spans) in blocked_sessions.buckets.items():
+            spans = np.array(spans, dtype=np.int32)
+            overlap = ((self.starts[:, None] < spans[:, 1]) & (spans[:, 0] < self.ends[:, None])).any(axis=1)
+            busy = self.room_busy if kind == 'room' else self.instructor_busy
+            busy[(key, day)] = overlap
+
+    def slot_mask(self, min_duration, max_duration, permanent):
+        """Slots of an acceptable length; permanent instructors skip lunch and stay within 8-5"""
+        key = (min_duration, max_duration, permanent)
+        mask = self._slot_masks.get(key)
+        if mask is None:
+            mask = (self.durations >= min_duration) & (self.durations <= max_duration)
+            if permanent:
+                mask &= self.lunch_free & self.office_hours
+            self._slot_masks[key] = mask
+        return mask
+
+    @staticmethod
+    def slot_allowed(start, end, min_duration, max_duration, permanent):
+        """``slot_mask`` for a single session from ``'HH:MM'`` times"""
+        start, end = _time_to_minutes(start), _time_to_minutes(end)
+        if not min_duration <= end - start <= max_duration:
+            return False
+        return not permanent or (not (start < LUNCH_END and LUNCH_START < end)
+                                 and PERMANENT_START <= start and end <= PERMANENT_END)
+
+    def free_mask(self, room_id, instructor_id, days):
+        """Slots where the room and the instructor are free on every one of ``days``"""
+        busy = self._none
+        for day in days:
+            busy = busy | self.room_busy.get((room_id, day), self._none) \
+                        | self.instructor_busy.get((instructor_id, day), self._none)
+        return ~busy
+
+    def usable_slots(self, room_id, instructor_id, days, slot_mask):
+        """Indices of the slots in ``slot_mask`` where the room and the instructor are free on ``days``"""
+        return np.nonzero(slot_mask & self.free_mask(room_id, instructor_id, days))[0].tolist()
+
+    def group(self, subject_id, instructor_id, room_id, day_ids, slot):
+        """The subject meets in the room at ``slot`` on each of ``day_ids``"""
+        start, end = self.spans[slot]
+        return tuple(Session(subject_id, instructor_id, room_id, day, start, end) for day in day_ids)
+
+
+class Placements:
+    """(room, slot) candidates of one subject on one day pattern, turned into groups on first use
+
+    Only the indices the domain keeps are ever built, and each is built once, so a
+    lecture half paired with several labs shares its Session records.
+    """
+
+    def __init__(self, catalogue, subject_id, instructor_id, days):
+        self.catalogue = catalogue
+        self.subject_id = subject_id
+        self.instructor_id = instructor_id
+        self.day_ids = [DAY_INDEX[day] for day in days]
+        self.placements = []
+        self._groups = {}
+
+    def __len__(self):
+        return len(self.placements)
+
+    def __getitem__(self, k):
+        group = self._groups.get(k)
+        if group is None:
+            room_id, slot = self.placements[k]
+            group = self._groups[k] = self.catalogue.group(
+                self.subject_id, self.instructor_id, room_id, self.day_ids, slot)
+        return group
+
+    def shuffle(self, rng):
+        rng.shuffle(self.placements)
+        self._groups.clear()
+
+    def sample(self, rng, k):
+        """Up to ``k`` groups in random order"""
+        if len(self) > k:
+            indices = rng.sample(range(len(self)), k)
+        else:
+            indices = list(range(len(self)))
+            rng.shuffle(indices)
+        return [self[i] for i in indices]
+
+
+def combine_halves(lectures, labs, compatible):
+    """Yield the compatible lecture + lab groups lazily, spread over as many halves as possible
+
+    Pass ``offset`` pairs lecture ``i`` with lab ``(i + offset) % len(labs)``. Each
+    pass uses every lecture once and spreads them evenly over the labs, and the
+    passes together visit each pair exactly once, so the first groups drawn
+    already cover as many rooms and slots as the halves offer.
+    """
+    n, m = len(lectures), len(labs)
+    for offset in range(m):
+        for i in range(n):
+            lec, lab = lectures[i], labs[(i + offset) % m]
+            if compatible(lec, lab):
+                yield lec + lab
+
+
+def build_time_slots(start_time_dt, end_time_dt):
+    """Distinct 60- and 90-minute slots on a 30-minute step inside the window"""
+    slots_60 = generate_time_slots_fixed(start_time_dt, end_time_dt, session_length_minutes=60, step_minutes=30)
+    slots_90 = generate_time_slots_fixed(start_time_dt, end_time_dt, session_length_minutes=90, step_minutes=30)
+
+    # Use set for O(1) lookups
+    time_slots = []
+    seen = set()
+    for s, e in slots_60 + slots_90:
+        key = f"{s}-{e}"
+        if key not in seen:
+            seen.add(key)
+            time_slots.append((s, e))
+    return time_slots
+
+
+# ---------- Domain builder ----------
+ROOM_TYPE_MAP = {
+    'lecture': 'Lecture',
+    'laboratory': 'Lab',
+    'lab': 'Lab'
+}
+MAX_DOMAIN_SIZE = 100
+
+def placement_rules(subj):
+    """``[(room_types, days, min_duration, max_duration)]`` for each half of a subject's sessions
+
+    Majors have a lecture half and a lab half, everything else a single one.
+    ``room_types`` lists the room type to use, then the one to fall back on when
+    the term has no room of the first.
+    """
+    lecture, lab = ROOM_TYPE_MAP['lecture'], ROOM_TYPE_MAP['laboratory']
+    units = int(subj.get('units', 3))
+    # MAJOR SUBJECTS: 5 hours per week (3 units = 3 hours lecture + 2 hours lab)
+    if (subj.get('course_type') or 'major').lower() == 'major' and units == 3:
+        # LECTURE SESSIONS (MWF - 1 hour each), LABORATORY SESSIONS (TTh - 1.5 hours each)
+        return [((lecture, lab), PATTERNS['MWF'], 45, 70), ((lab, lecture), PATTERNS['TTh'], 75, 110)]
+    if units >= 3:
+        return [((lecture,), PATTERNS['MWF'], 45, 70)]
+    if units == 2:
+        return [((lecture,), PATTERNS['TTh'], 75, 110)]
+    return [((lecture,), PATTERNS['OneDay'], 45, 70)]
+
+
+class DomainBuilder:
+    """Builds the candidate groups of each subject for one run
+
+    ``room_programs_map`` maps a room ID to the upper-cased programs allowed in it
+    (no entry means open to all). Sampling and shuffling use ``rng`` so a seeded
+    run is reproducible. ``preferred_rooms`` collects, per variable built, the
+    rooms reserved for its subject's program, for soft scoring.
+    """
+
+    def __init__(self, rooms, room_programs_map, max_loads, statuses, rng=random):
+        self.room_programs_map = room_programs_map
+        self.max_loads = max_loads
+        self.statuses = statuses
+        self.rng = rng
+        self.preferred_rooms = {}
+
+        # Pre-filter rooms by type for faster access
+        self.rooms_by_type = {}
+        for r in rooms:
+            self.rooms_by_type.setdefault(r['room_type'], []).append(r)
+
+    def rooms_for(self, room_types):
+        """Rooms of the first of ``room_types`` the term has any of"""
+        return next((self.rooms_by_type[t] for t in room_types if self.rooms_by_type.get(t)), [])
+
+    def build(self, subj, catalogue):
+        """Returns ``(variable, groups)`` for one subject row"""
+        sid = subj['subject_id']
+        instr_id = subj.get('instructor_id')
+        local_domain = []
+        if not instr_id or instr_id not in self.max_loads:
+            return str(sid), local_domain
+
+        permanent = self.statuses.get(instr_id, '') == 'permanent'
+        subj_program = (subj.get('course') or '').strip().upper()
+        rules = placement_rules(subj)
+        preferred = {room_id for room_id, programs in self.room_programs_map.items() if subj_program in programs}
+        if preferred:
+            self.preferred_rooms[str(sid)] = preferred
+
+        def candidates(room_list, days, min_duration, max_duration):
+            slot_mask = catalogue.slot_mask(min_duration, max_duration, permanent)
+            found = Placements(catalogue, sid, instr_id, days)
+            for room in room_list:
+                room_id = room['room_id']
+                allowed_programs = self.room_programs_map.get(room_id, [])
+                if allowed_programs and subj_program not in allowed_programs:
+                    continue
+                slots = catalogue.usable_slots(room_id, instr_id, days, slot_mask)
+                found.placements.extend((room_id, slot) for slot in slots)
+            return found
+
+        if len(rules) == 2:
+            (lec_types, *lec_rule), (lab_types, *lab_rule) = rules
+            lectures = candidates(self.rooms_for(lec_types), *lec_rule)
+            labs = candidates(self.rooms_for(lab_types), *lab_rule)
+
+            # Draw lecture + lab pairs lazily from shuffled halves, stopping at the domain limit
+            lectures.shuffle(self.rng)
+            labs.shuffle(self.rng)
+            local_domain = list(islice(combine_halves(lectures, labs, self._is_valid_combination), MAX_DOMAIN_SIZE))
+
+            # Fallback with limited candidates
+            if not local_domain:
+                local_domain.extend(lectures[k] for k in range(min(20, len(lectures))))
+                local_domain.extend(labs[k] for k in range(min(20, len(labs))))
+
+        else:
+            # NON-MAJOR SUBJECTS
+            (room_types, *rule), = rules
+            found = candidates(self.rooms_for(room_types), *rule)
+
+            # Limit domain size for performance
+            local_domain = found.sample(self.rng, MAX_DOMAIN_SIZE)
+
+        return str(sid), local_domain
+
+    @staticmethod
+    def _is_valid_combination(lec, lab):
+        """Fast combination validation"""
+        if lec[0].instructor_id != lab[0].instructor_id:
+            return False
+            
+        for a in lec:
+            for b in lab:
+                if a.day == b.day and a.start < b.end and b.start < a.end:
+                    return False
+        return True
+
+
+def prefilter_domains(domains, loads):
+    """Drop groups whose instructor is unknown or lacks the load for them
+
+    Returns ``(domains, unplaceable)`` where ``unplaceable`` lists the variables
+    left without any group.
+    """
+    for var, groups in list(domains.items()):
+        filtered = []
+        for g in groups:
+            instr = g[0].instructor_id
+            if instr not in loads:
+                continue
+            if len(g) > loads[instr]:
+                continue
+            filtered.append(g)
+        domains[var] = filtered
+
+    # Subjects left without any option can never be placed
+    unplaceable = [var for var, groups in domains.items() if not groups]
+    return {k: v for k, v in domains.items() if v}, unplaceable
@@ -0,0 +1,231 @@
+# scheduler_core/scoring.py
+"""Soft-constraint costs of a schedule and the branch and bound that lowers them
+
+Hard constraints decide whether a schedule is valid; these costs rank valid ones:
+
+    gaps    idle minutes between an instructor's classes on the same day
+    days    days on which an instructor teaches at all
+    hours   class minutes before 8:00 or after 17:00
+    rooms   sessions held outside the rooms reserved for the subject's program
+
+Each term is multiplied by its SOFT_WEIGHTS entry, so the cost is in idle-minute
+equivalents. Only values of the DomainTable are scored; approved schedules and
+kept drafts are not.
+"""
+import math
+import time
+
+import numpy as np
+
+from .search import (
+    STOP_CHECK_NODES, SearchCutoff, forward_check, is_consistent_assignment, select_unassigned_variable
+)
+
+SOFT_WEIGHTS = {'gaps': 1, 'days': 90, 'hours': 1, 'rooms': 60}
+PREFERRED_START, PREFERRED_END = 8 * 60, 17 * 60
+
+
+def _idle_minutes(spans):
+    """Minutes between the first start and the last end not spent in class"""
+    return max(e for _, e in spans) - min(s for s, _ in spans) - sum(e - s for s, e in spans)
+
+
+class SoftScorer:
+    """Soft costs of the values of one DomainTable
+
+    ``preferred_rooms`` maps a variable to the rooms reserved for its program, as
+    collected by DomainBuilder; variables without an entry have no preference.
+    """
+
+    def __init__(self, table, preferred_rooms=None, weights=None):
+        self.table = table
+        self.weights = {**SOFT_WEIGHTS, **(weights or {})}
+        preferred_rooms = preferred_rooms or {}
+
+        # The part of a value's cost that does not depend on other values
+        self.hours = np.zeros(len(table.groups), dtype=np.int64)
+        self.misplaced = np.zeros(len(table.groups), dtype=np.int64)
+        for vid, group in enumerate(table.groups):
+            preferred = preferred_rooms.get(table.owner[vid])
+            for s in group:
+                self.hours[vid] += max(0, min(s.end, PREFERRED_START) - s.start) \
+                                   + max(0, s.end - max(s.start, PREFERRED_END))
+                if preferred and s.room_id not in preferred:
+                    self.misplaced[vid] += 1
+        self.unary = self.weights['hours'] * self.hours + self.weights['rooms'] * self.misplaced
+
+    def state(self):
+        return ScoreState(self)
+
+    def breakdown(self, assignment):
+        """Each term of the cost of ``assignment``, unweighted, plus the weighted total"""
+        state = self.state()
+        for vid in assignment.values():
+            state.add(vid)
+        ids = np.fromiter(assignment.values(), dtype=np.int64, count=len(assignment))
+        return {
+            'gaps': state.gaps,
+            'days': state.days,
+            'hours': int(self.hours[ids].sum()),
+            'rooms': int(self.misplaced[ids].sum()),
+            'cost': state.cost,
+        }
+
+    def cost(self, assignment):
+        return self.breakdown(assignment)['cost']
+
+
+class ScoreState:
+    """Soft cost of a partial assignment, updated as values are added and removed"""
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+        self.groups = scorer.table.groups
+        self.busy = {}      # (instructor, day) -> spans of the classes placed there
+        self.unary = 0
+        self.gaps = 0
+        self.days = 0
+
+    @property
+    def cost(self):
+        weights = self.scorer.weights
+        return self.unary + weights['gaps'] * self.gaps + weights['days'] * self.days
+
+    @property
+    def lower_bound(self):
+        """Cost no completion can go below: a later class may fill a gap, but never frees a day"""
+        return self.unary + self.scorer.weights['days'] * self.days
+
+    def add(self, vid):
+        self.unary += int(self.scorer.unary[vid])
+        for s in self.groups[vid]:
+            spans = self.busy.setdefault((s.instructor_id, s.day), [])
+            if spans:
+                self.gaps -= _idle_minutes(spans)
+            else:
+                self.days += 1
+            spans.append((s.start, s.end))
+            self.gaps += _idle_minutes(spans)
+
+    def remove(self, vid):
+        self.unary -= int(self.scorer.unary[vid])
+        for s in reversed(self.groups[vid]):
+            key = (s.instructor_id, s.day)
+            spans = self.busy[key]
+            self.gaps -= _idle_minutes(spans)
+            spans.remove((s.start, s.end))
+            if spans:
+                self.gaps += _idle_minutes(spans)
+            else:
+                del self.busy[key]
+                self.days -= 1
+
+    def deltas(self, vid):
+        """``(cost change, lower bound change)`` of adding ``vid``"""
+        cost, bound = self.cost, self.lower_bound
+        self.add(vid)
+        change = (self.cost - cost, self.lower_bound - bound)
+        self.remove(vid)
+        return change
+
+
+# ---------- Branch and bound ----------
+def branch_and_bound(domains, table, max_loads, scorer, incumbent=None, stop=None, progress=None):
+    """Depth-first branch and bound on the soft cost
+
+    ``incumbent``, a valid complete assignment such as the first solution found,
+    is the schedule to beat. Values are tried in order of the cost they add; a
+    node is cut off once its lower bound - the cost so far without gaps plus the
+    cheapest unary cost left in every open domain - reaches the best cost found.
+    Returns ``(assignment, cost, proven)``; ``proven`` is True when the search
+    ran to the end, so no cheaper schedule exists.
+    """
+    metrics = table.context.metrics
+    best = {'assignment': dict(incumbent) if incumbent else None,
+            'cost': scorer.cost(incumbent) if incumbent else math.inf}
+    state = scorer.state()
+    domains = dict(domains)
+    assignment, loads = {}, {}
+    nodes = [0]
+
+    def remaining_bound():
+        return sum(int(scorer.unary[domains[v]].min()) for v in domains if v not in assignment)
+
+    def visit():
+        if len(assignment) == len(domains):
+            if state.cost < best['cost']:
+                best['assignment'], best['cost'] = dict(assignment), state.cost
+                metrics.incr('bnb_improvements')
+                if progress is not None:
+                    progress(nodes[0], best['cost'])
+            return
+
+        nodes[0] += 1
+        metrics.incr('bnb_nodes')
+        if stop is not None and nodes[0] % STOP_CHECK_NODES == 0 and stop():
+            raise SearchCutoff()
+
+        var = select_unassigned_variable(domains, assignment, degree=table.degree)
+        ids = domains[var].tolist()
+        rest = remaining_bound() - int(scorer.unary[domains[var]].min())
+        changes = [state.deltas(vid) for vid in ids]
+        # Cheapest first; the gap term can shrink, so the order says nothing about the bound
+        for k in sorted(range(len(ids)), key=lambda k: changes[k][0]):
+            vid = ids[k]
+            if state.lower_bound + changes[k][1] + rest >= best['cost']:
+                metrics.incr('bnb_prunes')
+                continue
+            instr = int(table.instructors[vid])
+            load = loads.get(instr, 0) + int(table.session_counts[vid])
+            if load > max_loads.get(instr, 0) or not is_consistent_assignment(assignment, vid, table):
+                continue
+
+            assignment[var] = vid
+            loads[instr] = load
+            state.add(vid)
+            backup, _ = forward_check(assignment, domains, var, vid, table)
+            if backup is not False:
+                visit()
+                for dv, vals in backup.items():
+                    domains[dv] = vals
+            state.remove(vid)
+            loads[instr] = load - int(table.session_counts[vid])
+            del assignment[var]
+
+    try:
+        visit()
+        proven = True
+    except SearchCutoff:
+        proven = False
+    return best['assignment'], best['cost'], proven
+
+
+def optimize_schedule(assignment, domains, table, max_loads, scorer, deadline=None, stop=None, progress=None):
+    """Lower the soft cost of a valid ``assignment`` until the deadline
+
+    Independent components share no instructor, room or subject, so their costs
+    add up and each is optimised on its own, with a share of the remaining time
+    in proportion to its size. Returns ``(assignment, cost, proven)``.
+    """
+    components = table.components(list(domains))
+    best = dict(assignment)
+    proven = True
+    left = len(domains)
+    for component in components:
+        share = None
+        if deadline is not None:
+            share = time.time() + max(0.0, deadline - time.time()) * len(component) / left
+        left -= len(component)
+        component_stop = lambda: (stop is not None and stop()) or (share is not None and time.time() > share)
+
+        incumbent = {var: best[var] for var in component}
+        on_progress = None
+        if progress is not None:
+            # Components add up, so the total moves by the component's improvement
+            base = scorer.cost(best) - scorer.cost(incumbent)
+            on_progress = lambda nodes, cost, base=base: progress(nodes, base + cost)
+        result, _, done = branch_and_bound({var: domains[var] for var in component}, table, max_loads, scorer,
+                                           incumbent=incumbent, stop=component_stop, progress=on_progress)
+        best.update(result)
+        proven = proven and done
+    return best, scorer.cost(best), proven
@@ -0,0 +1,1073 @@
+# scheduler_core/search.py
+"""Propagation, backjumping search, restarts, the process portfolio and local search
+
+Variables are subject IDs as strings; values are integer IDs interned by a
+DomainTable, and a domain is a NumPy array of value IDs.
+"""
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- CSP helpers ----------
+def ac3(domains, table, stop=None):
+    """Arc consistency over the constraint graph with AC-2001 last-support tracking
+
+    Arcs only join neighbours in ``table.neighbours``. For every arc the support
+    last found for each value is remembered, so a revision only searches again for
+    values whose support has been removed, and resumes after it. ``stop`` is polled
+    between revisions; stopping early leaves the domains sound but not fully
+    propagated. Returns False when a domain is wiped out.
+    """
+    if not domains:
+        return True
+
+    # Arcs whose every value found a support among the first candidates start
+    # consistent; only the rest are queued for a revision
+    supports = {}
+    queue = deque()
+    for xi in domains:
+        if stop is not None and stop():
+            return True
+        queue.extend(initial_supports(domains, xi, table, supports))
+    queued = set(queue)
+
+    while queue:
+        if stop is not None and stop():
+            break
+        arc = queue.popleft()
+        queued.discard(arc)
+        xi, xj = arc
+        table.context.metrics.incr('ac3_revisions')
+        if revise_2001(domains, xi, xj, table, supports):
+            if not len(domains[xi]):
+                return False
+            for xk in table.neighbours[xi]:
+                if xk != xj and xk in domains and (xk, xi) not in queued:
+                    queue.append((xk, xi))
+                    queued.add((xk, xi))
+    return True
+
+AC_SUPPORT_CHUNK = 4   # candidate supports checked per value in the first scan; doubles after
+
+def initial_supports(domains, xi, table, supports):
+    """First support search for every arc out of ``xi`` in one vectorized pass
+
+    Checks each value of xi against the first AC_SUPPORT_CHUNK values of every
+    neighbour and records the supports found. Returns the arcs where some value
+    found none, which still need revise_2001(). Neighbours sharing a subject need
+    the exact same-subject rules and are always returned.
+    """
+    rows = table.local(xi, domains[xi])
+    pending = []
+    batch = []
+    for xj in table.neighbours[xi]:
+        if xj not in domains:
+            continue
+        table.context.metrics.incr('ac3_arcs')
+        if xj in table.subject_peers[xi] or not len(domains[xj]):
+            pending.append((xi, xj))
+        else:
+            batch.append(xj)
+    if not batch or not len(rows):
+        return pending + [(xi, xj) for xj in batch]
+
+    chunk = AC_SUPPORT_CHUNK
+    # Candidate positions per neighbour, -1 where its domain is shorter than the chunk
+    cols = np.full((len(batch), chunk), -1, dtype=np.int64)
+    for k, xj in enumerate(batch):
+        first = np.sort(table.local(xj, domains[xj]))[:chunk]
+        cols[k, :len(first)] = first
+    bases = np.array([table.offsets[xj] for xj in batch], dtype=np.int64)
+
+    ids_a = np.broadcast_to((rows + table.offsets[xi])[:, None, None], (len(rows), len(batch), chunk))
+    ids_b = np.broadcast_to(np.maximum(cols, 0) + bases[:, None], ids_a.shape)
+    ok = table.pair_compatible(ids_a.ravel(), ids_b.ravel()).reshape(ids_a.shape) & (cols >= 0)
+    found = ok.any(axis=2)
+    first = ok.argmax(axis=2)
+
+    for k, xj in enumerate(batch):
+        last = supports[(xi, xj)] = np.full(table.sizes[xi], -1, dtype=np.int64)
+        hit = found[:, k]
+        last[rows[hit]] = cols[k, first[hit, k]]
+        if not hit.all():
+            pending.append((xi, xj))
+    return pending
+
+def revise_2001(domains, xi, xj, table, supports):
+    """Drop values of xi without support in xj, resuming each search after its last support
+
+    ``supports[(xi, xj)]`` holds, per position in xi's initial domain, the position
+    in xj's initial domain of the support found last (-1 before the first search).
+    Domains only shrink, so a value whose last support is still present keeps it,
+    and the search for a new one never has to look at positions before the old one.
+    """
+    domain_xi = domains[xi]
+    domain_xj = domains[xj]
+    if not len(domain_xi) or not len(domain_xj):
+        return False
+
+    last = supports.get((xi, xj))
+    if last is None:
+        last = supports[(xi, xj)] = np.full(table.sizes[xi], -1, dtype=np.int64)
+
+    rows = table.local(xi, domain_xi)
+    cols = np.sort(table.local(xj, domain_xj))
+    pos = np.searchsorted(cols, last[rows])
+    supported = (last[rows] >= 0) & (pos < len(cols)) & (cols[np.minimum(pos, len(cols) - 1)] == last[rows])
+
+    # Values of xi that lost their support, and where their next search starts in cols
+    pending = np.nonzero(~supported)[0]
+    start = pos[pending]
+    base_i, base_j = table.offsets[xi], table.offsets[xj]
+    exact_check = xj in table.subject_peers[xi]
+    chunk = AC_SUPPORT_CHUNK
+    while len(pending):
+        window = start[:, None] + np.arange(chunk)
+        in_range = window < len(cols)
+        candidates = cols[np.minimum(window, len(cols) - 1)]
+        ok = table.pair_compatible(
+            np.repeat(rows[pending] + base_i, chunk), candidates.ravel() + base_j, exact_check
+        ).reshape(len(pending), chunk) & in_range
+
+        found = ok.any(axis=1)
+        first = ok.argmax(axis=1)
+        last[rows[pending[found]]] = candidates[found, first[found]]
+        supported[pending[found]] = True
+
+        more = ~found & (start + chunk < len(cols))
+        pending, start = pending[more], start[more] + chunk
+        chunk *= 2
+
+    if supported.all():
+        return False
+    domains[xi] = domain_xi[supported]
+    table.context.metrics.incr('ac3_values_removed', int(len(supported) - supported.sum()))
+    return True
+
+def forward_check(assignment, domains, var, value, table):
+    """Prune every unassigned domain against ``value`` in one vectorized pass
+
+    Returns ``(backup, None)`` on success, or ``(False, wiped_var)`` naming the
+    variable whose domain was emptied.
+    """
+    backup = {}
+    others = [v for v in domains if v not in assignment and v != var]
+    if not others:
+        return backup, None
+
+    other_domains = [domains[v] for v in others]
+    keep = table.compatible_mask(value, np.concatenate(other_domains))
+    if keep.all():
+        return backup, None
+
+    bounds = np.cumsum([len(d) for d in other_domains])[:-1]
+    for other_var, dom, dom_keep in zip(others, other_domains, np.split(keep, bounds)):
+        if dom_keep.all():
+            continue
+
+        filtered = dom[dom_keep]
+        if not len(filtered):
+            table.context.metrics.incr('forward_check_wipeouts')
+            # Restore backups if failure
+            for dv, vals in backup.items():
+                domains[dv] = vals
+            return False, other_var
+        
+        backup[other_var] = dom
+        domains[other_var] = filtered
+        table.context.metrics.incr('forward_check_prunes', len(dom) - len(filtered))
+    
+    return backup, None
+
+
+# ---------- Consistency check ----------
+def is_consistent_assignment(assignment, candidate, table):
+    """Optimized consistency check with early termination"""
+    if assignment:
+        assigned = np.fromiter(assignment.values(), dtype=np.int64, count=len(assignment))
+        if not table.compatible_mask(candidate, assigned).all():
+            return False
+
+    # --- Additional rule for part-time instructors (spread loads across days)
+    # Only decidable once every subject of the instructor is placed; checking it
+    # earlier rejects orderings that would have spread out later
+    candidate_group = table.groups[candidate]
+    instr = candidate_group[0].instructor_id
+    owner = table.owner[candidate]
+    if table.context.statuses.get(instr, '') == 'part time' and all(
+            w in assignment or w == owner for w in table.instructor_vars.get(instr, ())):
+        assigned_days = set()
+        for vid in assignment.values():
+            grp = table.groups[vid]
+            if grp[0].instructor_id == instr:
+                assigned_days.update(s.day for s in grp)
+        new_days = {s.day for s in candidate_group}
+        all_days = assigned_days.union(new_days)
+        if len(all_days) == 1:  # all classes in one day
+            return False
+    return True
+
+
+def conflicting_assignments(assignment, candidate, table):
+    """Assigned variables that make ``candidate`` inconsistent or eat into its instructor's load"""
+    if not assignment:
+        return set()
+    variables = list(assignment)
+    assigned = np.fromiter(assignment.values(), dtype=np.int64, count=len(assignment))
+    incompatible = ~table.compatible_mask(candidate, assigned)
+    same_instructor = table.instructors[assigned] == table.instructors[candidate]
+    return {variables[i] for i in np.nonzero(incompatible | same_instructor)[0]}
+
+
+HEURISTICS = ('mrv', 'domwdeg', 'random')
+VALUE_ORDERS = ('lcv', 'sessions')
+
+def select_unassigned_variable(domains, assignment, weights=None, heuristic='mrv', rng=None, wdeg=None,
+                               degree=None):
+    """Pick the next variable to assign
+
+    ``mrv``      smallest domain, ties to the variable that failed most often, then
+                 to the one with most neighbours (shared instructors and rooms)
+    ``domwdeg``  smallest domain size divided by the weighted degree ``wdeg``: the
+                 summed weights of the variable's constraints, bumped on every
+                 wipeout they cause; ties to the higher degree
+    ``random``   smallest domain, ties broken at random
+    """
+    unassigned = [v for v in domains if v not in assignment]
+    if not unassigned:
+        return None
+
+    degree = degree or {}
+    if heuristic == 'domwdeg':
+        wdeg = wdeg or {}
+        return min(unassigned, key=lambda v: (len(domains[v]) / (1 + wdeg.get(v, 0)), -degree.get(v, 0)))
+    if heuristic == 'random' and rng is not None:
+        return min(unassigned, key=lambda v: (len(domains[v]), rng.random()))
+
+    weights = weights or {}
+    return min(unassigned, key=lambda v: (len(domains[v]), -weights.get(v, 0), -degree.get(v, 0)))
+
+
+RESTART_VALUE_NOISE = 0.5   # value-order keys are scaled by up to this much more on later restarts
+
+def order_values(domain, table, value_order='lcv', noise=None):
+    """Values in the order they are tried
+
+    ``lcv``       least constraining first: fewest clashes with other variables'
+                  values, from DomainTable.value_conflicts()
+    ``sessions``  fewest sessions first
+    ``noise`` is a numpy Generator on restarts after the first: every key is
+    scaled by a random factor in [1, 1 + RESTART_VALUE_NOISE), so each restart
+    tries a different but still mostly least-constraining order instead of
+    only reshuffling ties.
+    """
+    if value_order == 'lcv':
+        keys = table.value_conflicts()[domain]
+    else:
+        keys = table.session_counts[domain]
+    if noise is not None:
+        keys = (keys + 1) * (1 + RESTART_VALUE_NOISE * noise.random(len(domain)))
+    return domain[np.argsort(keys, kind='stable')]
+
+
+def count_group_sessions(group):
+    """Inline this function for speed"""
+    return len(group)
+
+
+# ---------- Backjumping search ----------
+class NogoodStore:
+    """Learned nogoods: combinations of (variable, value ID) assignments that cannot be extended
+
+    Each nogood is indexed under every literal it contains, so checking a candidate
+    only looks at the nogoods mentioning that exact (variable, value) pair. Only short
+    nogoods are kept since they prune the most and stay cheap to check.
+    """
+
+    def __init__(self, max_literals=4, max_nogoods=50000):
+        self.max_literals = max_literals
+        self.max_nogoods = max_nogoods
+        self.known = set()
+        self.watch = {}
+
+    def __len__(self):
+        return len(self.known)
+
+    def add(self, literals):
+        nogood = frozenset(literals)
+        if not nogood or len(nogood) > self.max_literals:
+            return
+        if nogood in self.known or len(self.known) >= self.max_nogoods:
+            return
+        self.known.add(nogood)
+        for literal in nogood:
+            self.watch.setdefault(literal, []).append(nogood)
+
+    def violated_by(self, var, vid, assignment):
+        """Variables of a learned nogood that ``var = vid`` would complete, or None"""
+        for nogood in self.watch.get((var, vid), ()):
+            if all(assignment.get(w) == u for w, u in nogood if w != var):
+                return {w for w, _ in nogood if w != var}
+        return None
+
+
+class SearchCutoff(Exception):
+    """Raised when a search exceeds its node budget"""
+
+
+class SearchInterrupted(Exception):
+    """Raised when a search is stopped by its time budget or a cancellation
+
+    Carries the largest consistent partial assignment reached before stopping.
+    """
+
+    def __init__(self, partial, restarts=0):
+        super().__init__(f"search stopped with {len(partial)} variables assigned")
+        self.partial = partial
+        self.restarts = restarts
+
+
+class SearchState:
+    """Bookkeeping for conflict-directed backjumping across one search"""
+
+    def __init__(self, domains, nogoods=None, weights=None, node_limit=None, on_progress=None,
+                 heuristic='mrv', rng=None, stop=None, constraint_weights=None, value_order='lcv',
+                 value_noise=None):
+        # Assigned variables whose forward checks removed values from each domain
+        self.pruned_by = {var: set() for var in domains}
+        self.nogoods = nogoods if nogoods is not None else NogoodStore()
+        # Failure counts per variable, shared across restarts to steer MRV ties
+        self.weights = weights if weights is not None else {}
+        # dom/wdeg: (var, var) constraint -> wipeouts it caused, and each variable's sum
+        self.constraint_weights = constraint_weights if constraint_weights is not None else {}
+        self.wdeg = {}
+        for (xi, xj), weight in self.constraint_weights.items():
+            self.wdeg[xi] = self.wdeg.get(xi, 0) + weight
+            self.wdeg[xj] = self.wdeg.get(xj, 0) + weight
+        self.value_order = value_order
+        # numpy Generator perturbing the value order, or None for the plain order
+        self.value_noise = value_noise
+        self.node_limit = node_limit
+        self.nodes = 0
+        # Called with the node count every PROGRESS_EVERY_NODES nodes
+        self.on_progress = on_progress
+        self.heuristic = heuristic
+        self.rng = rng
+        # Polled every STOP_CHECK_NODES nodes; True ends the search with SearchInterrupted
+        self.stop = stop
+        self.best_partial = {}
+        # Zobrist signature of the current assignment, updated on every assign and undo
+        self.signature = 0
+
+    def learn(self, conflict_set, assignment):
+        self.nogoods.add((w, assignment[w]) for w in conflict_set)
+
+    def bump(self, var):
+        self.weights[var] = self.weights.get(var, 0) + 1
+
+    def bump_constraint(self, xi, xj):
+        """Weigh the constraint between xi and xj up after it wiped out a domain"""
+        key = (xi, xj) if xi < xj else (xj, xi)
+        self.constraint_weights[key] = self.constraint_weights.get(key, 0) + 1
+        self.wdeg[xi] = self.wdeg.get(xi, 0) + 1
+        self.wdeg[xj] = self.wdeg.get(xj, 0) + 1
+
+
+PROGRESS_EVERY_NODES = 500
+STOP_CHECK_NODES = 16
+
+def backtrack(assignment, domains, table, instructor_load, max_loads, state=None):
+    """Conflict-directed backjumping search; assignment maps variables to value IDs"""
+    if state is None:
+        state = SearchState(domains)
+    state.signature = 0
+    for vid in assignment.values():
+        state.signature ^= table.zobrist[vid]
+    result, _ = _backtrack_cbj(state, assignment, domains, table, instructor_load, max_loads)
+    return result
+
+
+def _backtrack_cbj(state, assignment, domains, table, instructor_load, max_loads):
+    """Returns ``(assignment, None)`` on success or ``(None, conflict_set)`` on failure
+
+    The conflict set holds the assigned variables responsible for the failure. A
+    level whose variable is not in its child's conflict set returns straight away,
+    jumping back to the deepest variable that actually caused the dead end.
+    """
+    if len(assignment) == len(domains):
+        return assignment, None
+
+    context = table.context
+    state.nodes += 1
+    context.metrics.incr('nodes')
+    if state.node_limit is not None and state.nodes > state.node_limit:
+        raise SearchCutoff()
+    if state.on_progress is not None and state.nodes % PROGRESS_EVERY_NODES == 0:
+        state.on_progress(state.nodes)
+    if len(assignment) > len(state.best_partial):
+        state.best_partial = dict(assignment)
+    if state.stop is not None and state.nodes % STOP_CHECK_NODES == 0 and state.stop():
+        raise SearchInterrupted(state.best_partial)
+
+    # The domains and instructor loads are a function of the assignment (forward
+    # checking only ever filters the initial domains), so its Zobrist signature
+    # identifies a failed search state on its own
+    state_sig = state.signature
+    cached = context.backtrack_cache.get(state_sig)
+    if cached is not None:
+        return None, set(cached)
+
+    var = select_unassigned_variable(domains, assignment, state.weights, state.heuristic, state.rng,
+                                     state.wdeg, table.degree)
+    if var is None:
+        return None, set(assignment)
+
+    domain_vals = order_values(domains[var], table, state.value_order, state.value_noise)
+
+    conflict_set = set()
+    for vid in domain_vals.tolist():
+        instr = int(table.instructors[vid])
+        if not instr:
+            continue
+
+        sessions_needed = int(table.session_counts[vid])
+        current_load = instructor_load.get(instr, 0)
+        
+        # Early load check
+        if current_load + sessions_needed > max_loads.get(instr, 0):
+            conflict_set.update(w for w, u in assignment.items() if table.instructors[u] == instr)
+            continue
+
+        # Learned nogoods
+        culprits = state.nogoods.violated_by(var, vid, assignment)
+        if culprits is not None:
+            context.metrics.incr('nogood_prunes')
+            conflict_set.update(culprits)
+            continue
+
+        # Early consistency check
+        if not is_consistent_assignment(assignment, vid, table):
+            conflict_set.update(conflicting_assignments(assignment, vid, table))
+            continue
+
+        assignment[var] = vid
+        instructor_load[instr] = current_load + sessions_needed
+        zobrist = table.zobrist[vid]
+        state.signature ^= zobrist
+
+        backup, wiped = forward_check(assignment, domains, var, vid, table)
+        if backup is False:
+            # var = vid together with whatever pruned the wiped domain earlier
+            conflict_set.update(state.pruned_by[wiped])
+            state.bump(wiped)
+            state.bump_constraint(var, wiped)
+            del assignment[var]
+            instructor_load[instr] = current_load
+            state.signature ^= zobrist
+            continue
+
+        for dv in backup:
+            state.pruned_by[dv].add(var)
+
+        result, child_conflicts = _backtrack_cbj(state, assignment, domains, table, instructor_load, max_loads)
+        if result:
+            return result, None
+
+        # rollback
+        del assignment[var]
+        instructor_load[instr] = current_load
+        state.signature ^= zobrist
+        for dv, vals in backup.items():
+            domains[dv] = vals
+            state.pruned_by[dv].discard(var)
+
+        if var not in child_conflicts:
+            # This choice played no part in the failure below: jump over it
+            context.metrics.incr('backjumps')
+            context.backtrack_cache.put(state_sig, frozenset(child_conflicts))
+            return None, child_conflicts
+        conflict_set.update(child_conflicts)
+        conflict_set.discard(var)
+
+    # Values removed by forward checking failed because of the variables that pruned them
+    conflict_set.update(state.pruned_by[var])
+    state.learn(conflict_set, assignment)
+    state.bump(var)
+    context.metrics.incr('backtracks')
+    context.backtrack_cache.put(state_sig, frozenset(conflict_set))
+    return None, conflict_set
+
+
+# ---------- Restarts ----------
+def luby(i):
+    """i-th term (1-based) of the Luby sequence: 1 1 2 1 1 2 4 1 1 2 ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
+def restart_budgets(strategy='luby', base_nodes=200, factor=1.5):
+    """Endless node budgets for successive restarts"""
+    i = 1
+    while True:
+        if strategy == 'geometric':
+            yield int(base_nodes * factor ** (i - 1))
+        else:
+            yield base_nodes * luby(i)
+        i += 1
+
+
+def solve_with_restarts(domains, table, max_loads, strategy='luby', base_nodes=200, seed=None,
+                        progress=None, heuristic='mrv', stop=None, value_order='lcv'):
+    """Run backtrack() under growing node budgets, perturbing value order on every restart
+
+    Nogoods, variable failure weights, dom/wdeg constraint weights and
+    proven-failure memos carry over between runs. The first run tries values in
+    plain ``value_order``; later runs add seeded noise to it (see order_values).
+    ``progress(nodes, restarts)`` is called periodically with the total node
+    count. Returns ``(assignment, restarts)``; the assignment is None when the
+    search proves there is no solution. Raises SearchInterrupted with the best
+    partial assignment of all runs once ``stop()`` returns True.
+    """
+    rng = random.Random(seed)
+    nogoods = NogoodStore()
+    weights = {}
+    constraint_weights = {}
+    run_domains = dict(domains)
+    total_nodes = 0
+    best_partial = {}
+
+    for restarts, budget in enumerate(restart_budgets(strategy, base_nodes)):
+        on_progress = None
+        if progress is not None:
+            on_progress = lambda nodes, done=total_nodes, r=restarts: progress(done + nodes, r)
+        value_noise = np.random.default_rng(rng.getrandbits(64)) if restarts else None
+        state = SearchState(run_domains, nogoods=nogoods, weights=weights, node_limit=budget,
+                            on_progress=on_progress, heuristic=heuristic, rng=rng, stop=stop,
+                            constraint_weights=constraint_weights, value_order=value_order,
+                            value_noise=value_noise)
+        try:
+            result = backtrack({}, run_domains, table, {}, max_loads, state=state)
+            return result, restarts
+        except SearchInterrupted as e:
+            raise SearchInterrupted(max(best_partial, e.partial, key=len), restarts)
+        except SearchCutoff:
+            table.context.metrics.incr('restarts')
+            total_nodes += state.nodes
+            if progress is not None:
+                progress(total_nodes, restarts + 1)
+            best_partial = max(best_partial, state.best_partial, key=len)
+
+        run_domains = {var: dom[rng.sample(range(len(dom)), len(dom))] for var, dom in domains.items()}
+
+
+# ---------- Worker processes ----------
+def _worker_context():
+    """Multiprocessing context for solver workers
+
+    The solver runs on a worker thread of the web process, and forking a
+    threaded process can copy locks held by other threads (logging, the database
+    driver, the solution cache) into a child that then deadlocks. Workers start
+    from a fork server instead, or are spawned where there is none, and receive
+    their inputs pickled; the fork server preloads only this module.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('forkserver')
+        ctx.set_forkserver_preload([__name__])
+        return ctx
+    return multiprocessing.get_context('spawn')
+
+
+# ---------- Portfolio ----------
+PORTFOLIO_HEURISTICS = HEURISTICS
+PORTFOLIO_MIN_VARIABLES = 30   # below this, process start-up costs more than it saves
+PORTFOLIO_STOP_GRACE = 5.0     # seconds interrupted workers get to report their partials
+
+def portfolio_configs(workers, seed=None, value_order='lcv'):
+    """One solver configuration per worker: seeds, orderings and restart schedules differ"""
+    base_seed = seed if seed is not None else random.randrange(1 << 30)
+    return [
+        {
+            'seed': base_seed + i,
+            'heuristic': PORTFOLIO_HEURISTICS[i % len(PORTFOLIO_HEURISTICS)],
+            'strategy': 'luby' if (i // len(PORTFOLIO_HEURISTICS)) % 2 == 0 else 'geometric',
+            'value_order': value_order,
+        }
+        for i in range(workers)
+    ]
+
+
+def _portfolio_worker(index, config, payload, results, node_counts, restart_counts, stop_event, deadline):
+    """Entry point of one portfolio process; ``payload`` is the pickled ``(domains, table, max_loads)``"""
+    domains, table, max_loads = pickle.loads(payload)
+    # The table arrives with the parent's counts; report only this worker's own
+    metrics = table.context.metrics
+    metrics.counters.clear()
+    stop = lambda: stop_event.is_set() or (deadline is not None and time.time() > deadline)
+
+    def progress(nodes, restarts):
+        node_counts[index] = nodes
+        restart_counts[index] = restarts
+
+    try:
+        result, restarts = solve_with_restarts(
+            domains, table, max_loads, strategy=config['strategy'], seed=config['seed'],
+            heuristic=config['heuristic'], progress=progress, stop=stop, value_order=config['value_order']
+        )
+        results.put((index, result, restarts, None, None, dict(metrics.counters)))
+    except SearchInterrupted as e:
+        results.put((index, None, e.restarts, None, e.partial, dict(metrics.counters)))
+    except Exception as e:
+        results.put((index, None, 0, f"{type(e).__name__}: {e}", None, dict(metrics.counters)))
+
+
+def solve_portfolio(domains, table, max_loads, workers=None, seed=None, progress=None, stop=None,
+                    deadline=None, value_order='lcv'):
+    """Race differently configured searches on all cores; the first finished search wins
+
+    Every process starts from the same prepared domains. A solution or a proof of
+    infeasibility from any worker ends the race, and the other workers are
+    terminated. Returns ``(assignment, restarts, config)``. When ``stop()`` turns
+    True or ``deadline`` passes, the workers are asked to stop and the largest
+    partial assignment among them is raised with SearchInterrupted, empty if none
+    reported within PORTFOLIO_STOP_GRACE. When no worker finishes cleanly, the
+    first worker error is raised as RuntimeError: a crash proves nothing.
+    """
+    workers = workers or os.cpu_count() or 1
+    configs = portfolio_configs(workers, seed, value_order)
+    stop_now = lambda: (stop is not None and stop()) or (deadline is not None and time.time() > deadline)
+    if workers <= 1 or len(domains) < PORTFOLIO_MIN_VARIABLES:
+        result, restarts = solve_with_restarts(domains, table, max_loads, seed=configs[0]['seed'],
+                                               progress=progress, stop=stop_now, value_order=value_order)
+        return result, restarts, configs[0]
+
+    ctx = _worker_context()
+    # Pickled once here rather than once per process
+    payload = pickle.dumps((domains, table, max_loads), protocol=pickle.HIGHEST_PROTOCOL)
+    results = ctx.Queue()
+    stop_event = ctx.Event()
+    node_counts = ctx.Array('q', workers, lock=False)
+    restart_counts = ctx.Array('q', workers, lock=False)
+    processes = [
+        ctx.Process(
+            target=_portfolio_worker,
+            args=(i, config, payload, results, node_counts, restart_counts, stop_event, deadline),
+            daemon=True
+        )
+        for i, config in enumerate(configs)
+    ]
+    for proc in processes:
+        proc.start()
+
+    try:
+        pending = len(processes)
+        partials = []
+        errors = []
+        stopped_at = None
+        while pending:
+            if stopped_at is None and stop_now():
+                stop_event.set()
+                stopped_at = time.time()
+            elif stopped_at is not None and time.time() - stopped_at > PORTFOLIO_STOP_GRACE:
+                break
+            try:
+                index, result, restarts, error, partial, counters = results.get(timeout=1.0)
+            except queue.Empty:
+                if progress is not None:
+                    progress(sum(node_counts), sum(restart_counts))
+                if not any(proc.is_alive() for proc in processes) and results.empty():
+                    break
+                continue
+
+            pending -= 1
+            table.context.metrics.merge(counters)
+            if error:
+                logger.warning("portfolio worker %s failed: %s", index, error)
+                errors.append(f"worker {index}: {error}")
+                continue
+            if partial is not None:
+                # Interrupted workers report in one by one; the largest partial wins
+                partials.append(partial)
+                continue
+            logger.info("portfolio won by worker %s (%s)", index, configs[index])
+            return result, restarts, configs[index]
+        if partials or stopped_at is not None or stop_now():
+            raise SearchInterrupted(max(partials, key=len, default={}), sum(restart_counts))
+        raise RuntimeError(f"portfolio search failed, {errors[0]}" if errors
+                           else "portfolio workers exited without reporting a result")
+    finally:
+        for proc in processes:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in processes:
+            proc.join(timeout=1.0)
+
+
+# ---------- Independent components ----------
+COMPONENT_POOL_MIN_VARIABLES = 30   # below this many variables in total, components run inline
+
+# Shared with component worker processes by _init_component_worker
+_component_context = {}
+
+def _init_component_worker(payload, stop_event, node_counts, deadline):
+    table, max_loads = pickle.loads(payload)
+    table.context.metrics.counters.clear()
+    _component_context.update(table=table, max_loads=max_loads, stop_event=stop_event,
+                              node_counts=node_counts, deadline=deadline)
+
+
+def _solve_component_task(task):
+    """Pool task: search one component; returns ``(index, assignment, restarts, partial, counters)``"""
+    index, domains, options = task
+    ctx = _component_context
+    metrics = ctx['table'].context.metrics
+    metrics.counters.clear()
+    stop = lambda: ctx['stop_event'].is_set() or (ctx['deadline'] is not None and time.time() > ctx['deadline'])
+
+    def progress(nodes, restarts):
+        ctx['node_counts'][index] = nodes
+
+    try:
+        result, restarts = solve_with_restarts(domains, ctx['table'], ctx['max_loads'], progress=progress,
+                                               stop=stop, **options)
+        return index, result, restarts, None, dict(metrics.counters)
+    except SearchInterrupted as e:
+        return index, None, e.restarts, e.partial, dict(metrics.counters)
+
+
+def solve_components(domains, table, max_loads, solver='portfolio', workers=None, seed=None, progress=None,
+                     stop=None, deadline=None, heuristic='mrv', value_order='lcv'):
+    """Split the problem into independent components, solve each and merge the results
+
+    Subjects that share no instructor and cannot meet in the same room never
+    constrain each other, so each connected component of the constraint graph is
+    searched on its own. A single component goes to the portfolio or the single
+    search as chosen by ``solver``; several are spread over a process pool, one
+    restart search per component. Returns ``(assignment, restarts)``: None when
+    any component is proven unsolvable. When ``stop()`` turns True or the
+    deadline passes, SearchInterrupted carries the solved components plus the
+    partial assignments of the others; pool workers still busy after
+    PORTFOLIO_STOP_GRACE are abandoned.
+    """
+    components = table.components([var for var in domains])
+    metrics = table.context.metrics
+    metrics.incr('components', len(components))
+    stop_now = lambda: (stop is not None and stop()) or (deadline is not None and time.time() > deadline)
+    base_seed = seed if seed is not None else random.randrange(1 << 30)
+
+    if len(components) <= 1:
+        if solver == 'portfolio':
+            result, restarts, _ = solve_portfolio(domains, table, max_loads, workers=workers, seed=base_seed,
+                                                  progress=progress, stop=stop, deadline=deadline,
+                                                  value_order=value_order)
+            return result, restarts
+        return solve_with_restarts(domains, table, max_loads, seed=base_seed, progress=progress, stop=stop_now,
+                                   heuristic=heuristic, value_order=value_order)
+
+    logger.info("solving %d independent components; largest has %d of %d variables",
+                len(components), len(components[0]), len(domains))
+    tasks = [
+        (i, {var: domains[var] for var in component},
+         {'seed': base_seed + i, 'heuristic': heuristic, 'value_order': value_order})
+        for i, component in enumerate(components)
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    assignment, partial, total_restarts = {}, {}, 0
+    interrupted_any = False
+
+    if workers <= 1 or len(domains) < COMPONENT_POOL_MIN_VARIABLES:
+        done_nodes = 0
+        for index, component_domains, options in tasks:
+            on_progress = None
+            if progress is not None:
+                on_progress = lambda nodes, restarts, done=done_nodes: progress(done + nodes, total_restarts + restarts)
+            nodes_before = metrics.counters['nodes']
+            try:
+                result, restarts = solve_with_restarts(component_domains, table, max_loads, progress=on_progress,
+                                                       stop=stop_now, **options)
+            except SearchInterrupted as e:
+                partial.update(e.partial)
+                total_restarts += e.restarts
+                interrupted_any = True
+                continue
+            finally:
+                done_nodes += metrics.counters['nodes'] - nodes_before
+            total_restarts += restarts
+            if result is None:
+                return None, total_restarts
+            assignment.update(result)
+        if interrupted_any:
+            raise SearchInterrupted({**assignment, **partial}, total_restarts)
+        return assignment, total_restarts
+
+    ctx = _worker_context()
+    stop_event = ctx.Event()
+    node_counts = ctx.Array('q', len(tasks), lock=False)
+    payload = pickle.dumps((table, max_loads), protocol=pickle.HIGHEST_PROTOCOL)
+    pool = ctx.Pool(workers, initializer=_init_component_worker,
+                    initargs=(payload, stop_event, node_counts, deadline))
+    try:
+        # Largest components first so they start before the pool fills with small ones
+        pending = pool.imap_unordered(_solve_component_task, tasks)
+        stopped_at = None
+        for _ in tasks:
+            while True:
+                if stopped_at is None and stop_now():
+                    stop_event.set()
+                    stopped_at = time.time()
+                elif stopped_at is not None and time.time() - stopped_at > PORTFOLIO_STOP_GRACE:
+                    raise SearchInterrupted({**assignment, **partial}, total_restarts)
+                try:
+                    index, result, restarts, interrupted, counters = pending.next(timeout=1.0)
+                    break
+                except multiprocessing.TimeoutError:
+                    if progress is not None:
+                        progress(sum(node_counts), total_restarts)
+            metrics.merge(counters)
+            total_restarts += restarts
+            if interrupted is not None:
+                partial.update(interrupted)
+                interrupted_any = True
+            elif result is None:
+                logger.info("component %d of %d variables has no solution", index, len(tasks[index][1]))
+                return None, total_restarts
+            else:
+                assignment.update(result)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    if interrupted_any:
+        raise SearchInterrupted({**assignment, **partial}, total_restarts)
+    return assignment, total_restarts
+
+
+# ---------- Local search ----------
+LOCAL_SEARCH_TIME_LIMIT = 10.0
+LOCAL_SEARCH_MAX_STEPS = 200000
+TABU_TENURE = 10
+
+class ConflictState:
+    """A complete (possibly conflicting) assignment with incrementally maintained conflict counts
+
+    ``pair_conflicts[i]`` is the number of variables whose value clashes with the
+    value of variable ``i``; instructor overload and the part-time one-day rule are
+    tracked per instructor.
+    """
+
+    def __init__(self, variables, table, max_loads):
+        self.variables = variables
+        self.table = table
+        self.max_loads = max_loads
+        self.values = np.full(len(variables), -1, dtype=np.int64)
+        self.pair_conflicts = np.zeros(len(variables), dtype=np.int64)
+        self.loads = {}
+        self.instructor_of = np.array(
+            [table.instructors[table.offsets[v]] for v in variables], dtype=np.int64)
+
+    def clashes(self, vid, index):
+        """Boolean mask of assigned variables (other than ``index``) clashing with ``vid``"""
+        assigned = self.values >= 0
+        clash = np.zeros(len(self.values), dtype=bool)
+        clash[assigned] = ~self.table.compatible_mask(vid, self.values[assigned])
+        clash[index] = False
+        return clash
+
+    def overload(self, instr, load):
+        return max(0, load - self.max_loads.get(instr, 0))
+
+    def one_day_penalty(self, instr, index=None, vid=None):
+        """1 if a part-time instructor with every subject placed teaches on a single day"""
+        if self.table.context.statuses.get(instr, '') != 'part time':
+            return 0
+        days = set()
+        for j in np.nonzero(self.instructor_of == instr)[0]:
+            value = vid if j == index else self.values[j]
+            if value < 0:
+                return 0
+            days.update(s.day for s in self.table.groups[value])
+        return 1 if len(days) == 1 else 0
+
+    def instructor_cost(self, instr, load, index=None, vid=None):
+        return self.overload(instr, load) + self.one_day_penalty(instr, index, vid)
+
+    def move_costs(self, index, ids):
+        """Cost of each value in ``ids`` for variable ``index`` given the other variables"""
+        instr = int(self.instructor_of[index])
+        current = self.values[index]
+        base_load = self.loads.get(instr, 0) - (self.table.session_counts[current] if current >= 0 else 0)
+        costs = np.empty(len(ids), dtype=np.int64)
+        for k, vid in enumerate(ids.tolist()):
+            load = base_load + int(self.table.session_counts[vid])
+            costs[k] = int(self.clashes(vid, index).sum()) + self.instructor_cost(instr, load, index, vid)
+        return costs
+
+    def assign(self, index, vid):
+        old = self.values[index]
+        instr = int(self.instructor_of[index])
+        if old >= 0:
+            self.pair_conflicts -= self.clashes(old, index)
+            self.loads[instr] -= int(self.table.session_counts[old])
+        new_clash = self.clashes(vid, index)
+        self.pair_conflicts += new_clash
+        self.pair_conflicts[index] = new_clash.sum()
+        self.values[index] = vid
+        self.loads[instr] = self.loads.get(instr, 0) + int(self.table.session_counts[vid])
+
+    def violations(self):
+        """Variables involved in any violated constraint"""
+        bad = self.pair_conflicts > 0
+        for instr, load in self.loads.items():
+            if self.instructor_cost(instr, load):
+                bad |= self.instructor_of == instr
+        return np.nonzero(bad)[0]
+
+    def cost(self):
+        instructor_costs = sum(self.instructor_cost(instr, load) for instr, load in self.loads.items())
+        return int(self.pair_conflicts.sum()) // 2 + instructor_costs
+
+
+def min_conflicts(domains, table, max_loads, time_limit=LOCAL_SEARCH_TIME_LIMIT,
+                  max_steps=LOCAL_SEARCH_MAX_STEPS, tabu_tenure=TABU_TENURE, seed=None, progress=None,
+                  stop=None):
+    """Tabu min-conflicts search over complete assignments
+
+    Starts from a greedy assignment (smallest domains first, fewest clashes), then
+    repeatedly moves a random conflicted variable to its least-conflicting value that
+    is not tabu. Returns ``(assignment, conflicts)`` for the best assignment seen.
+    """
+    rng = random.Random(seed)
+    variables = [v for v in domains if len(domains[v])]
+    state = ConflictState(variables, table, max_loads)
+
+    for index in sorted(range(len(variables)), key=lambda i: len(domains[variables[i]])):
+        ids = domains[variables[index]]
+        costs = state.move_costs(index, ids)
+        best = np.nonzero(costs == costs.min())[0]
+        state.assign(index, int(ids[rng.choice(best.tolist())]))
+
+    best_values = state.values.copy()
+    best_cost = state.cost()
+    tabu = {}
+    deadline = time.time() + time_limit
+    step = 0
+    while best_cost and step < max_steps and time.time() < deadline:
+        if stop is not None and stop():
+            break
+        step += 1
+        table.context.metrics.incr('local_search_steps')
+        conflicted = state.violations()
+        if not len(conflicted):
+            break
+        index = int(conflicted[rng.randrange(len(conflicted))])
+        ids = domains[variables[index]]
+        if len(ids) < 2:
+            continue
+
+        costs = state.move_costs(index, ids)
+        current_cost = state.cost()
+        current_share = costs[np.nonzero(ids == state.values[index])[0][0]]
+        # Tabu values are allowed when they would beat the best assignment so far
+        allowed = np.array([
+            tabu.get((index, vid), 0) < step or current_cost - current_share + c < best_cost
+            for vid, c in zip(ids.tolist(), costs.tolist())
+        ])
+        allowed &= ids != state.values[index]
+        if not allowed.any():
+            continue
+        candidates = np.nonzero(allowed & (costs == costs[allowed].min()))[0]
+        tabu[(index, int(state.values[index]))] = step + tabu_tenure
+        state.assign(index, int(ids[rng.choice(candidates.tolist())]))
+
+        cost = state.cost()
+        if cost < best_cost:
+            best_cost = cost
+            best_values = state.values.copy()
+        if progress is not None and step % PROGRESS_EVERY_NODES == 0:
+            progress(step, best_cost)
+
+    assignment = {var: int(vid) for var, vid in zip(variables, best_values.tolist())}
+    return assignment, best_cost
+
+
+# ---------- Partial results ----------
+class SolveOutcome:
+    """Result of one build, propagate and search pass over a set of subjects"""
+
+    def __init__(self, table=None, assignment=None, error=None, interrupted=False, seconds=0.0,
+                 unplaceable=()):
+        self.table = table
+        self.assignment = assignment
+        self.error = error
+        # True when the time budget or a cancellation stopped the search; the
+        # assignment then holds the largest consistent partial schedule
+        self.interrupted = interrupted
+        self.seconds = seconds
+        # Variables whose domain was empty before the search started
+        self.unplaceable = list(unplaceable)
+
+
+def extend_partial(partial, table, max_loads, stop=None):
+    """Greedily add every variable that still fits next to a partial assignment
+
+    The search's partial follows one branch; many of the subjects it never reached
+    still have a consistent value, so they are placed smallest domain first.
+    """
+    assignment = dict(partial)
+    loads = {}
+    for vid in assignment.values():
+        instr = int(table.instructors[vid])
+        loads[instr] = loads.get(instr, 0) + int(table.session_counts[vid])
+
+    for var in sorted((v for v in table.variables if v not in assignment), key=lambda v: table.sizes[v]):
+        if stop is not None and stop():
+            break
+        for vid in table.ids(var).tolist():
+            instr = int(table.instructors[vid])
+            load = loads.get(instr, 0) + int(table.session_counts[vid])
+            if load <= max_loads.get(instr, 0) and is_consistent_assignment(assignment, vid, table):
+                assignment[var] = vid
+                loads[instr] = load
+                break
+    return assignment
+
+
+def explain_unscheduled(var, partial, table, max_loads):
+    """Why ``var`` is missing from a partial assignment, in words for the admin"""
+    ids = table.ids(var)
+    instr = int(table.instructors[ids[0]])
+    load = sum(int(table.session_counts[vid]) for vid in partial.values() if table.instructors[vid] == instr)
+    max_load = max_loads.get(instr, 0)
+    fits_load = load + table.session_counts[ids] <= max_load
+    if not fits_load.any():
+        return f"Instructor load limit reached ({load} of {max_load} sessions already placed)."
+
+    placed = list(partial)
+    assigned = np.fromiter(partial.values(), dtype=np.int64, count=len(partial))
+    blockers = set()
+    for vid in ids[fits_load].tolist():
+        clash = ~table.compatible_mask(vid, assigned)
+        if not clash.any():
+            if is_consistent_assignment(partial, vid, table):
+                return "The time budget ran out before this subject could be placed."
+            continue
+        blockers.update(placed[i] for i in np.nonzero(clash)[0])
+
+    if not blockers:
+        return "Its part-time instructor would teach every class on a single day."
+    shown = ', '.join(sorted(blockers, key=int)[:5])
+    more = f" and {len(blockers) - 5} more" if len(blockers) > 5 else ""
+    return f"Every remaining option clashes with scheduled subjects {shown}{more}."
@@ -0,0 +1,75 @@
+# scheduler_core/telemetry.py
+"""Structured metrics of one generation run
+
+Each run's SolverContext owns a SolverMetrics that the solver modules count into;
+the caller reads ``context.metrics.to_dict()`` at the end of the run.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+# Counter pairs reported as hit rates: name -> (hits counter, misses counter)
+CACHE_COUNTERS = {
+    'compatibility_cache': ('compatibility_cache_hits', 'compatibility_cache_misses'),
+    'backtrack_cache': ('backtrack_cache_hits', 'backtrack_cache_misses'),
+}
+
+
+class SolverMetrics:
+    """Counters, per-phase timings and domain size snapshots of the current run"""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.phases = {}
+        self.domains = {}
+
+    def reset(self):
+        self.counters.clear()
+        self.phases.clear()
+        self.domains.clear()
+
+    def incr(self, name, amount=1):
+        self.counters[name] += amount
+
+    def merge(self, counters):
+        """Add counters collected elsewhere, e.g. by a portfolio worker process"""
+        self.counters.update(counters)
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block; repeated phases (incremental expansions) add up"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def record_domains(self, stage, domains):
+        """Snapshot domain sizes at ``stage``; later snapshots of the same stage replace earlier ones"""
+        sizes = np.array([len(d) for d in domains.values()], dtype=np.int64)
+        self.domains[stage] = {
+            'variables': int(len(sizes)),
+            'values': int(sizes.sum()) if len(sizes) else 0,
+            'min': int(sizes.min()) if len(sizes) else 0,
+            'max': int(sizes.max()) if len(sizes) else 0,
+            'mean': round(float(sizes.mean()), 2) if len(sizes) else 0.0,
+            'empty': int((sizes == 0).sum()),
+        }
+
+    def cache_hit_rates(self):
+        rates = {}
+        for cache, (hits_name, misses_name) in CACHE_COUNTERS.items():
+            hits, misses = self.counters[hits_name], self.counters[misses_name]
+            rates[cache] = round(hits / (hits + misses), 4) if hits + misses else None
+        return rates
+
+    def to_dict(self):
+        return {
+            'counters': dict(self.counters),
+            'cache_hit_rates': self.cache_hit_rates(),
+            'domains': {stage: dict(sizes) for stage, sizes in self.domains.items()},
+            'phases': {name: round(seconds, 4) for name, seconds in self.phases.items()},
+        }
+